@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import scrolledtext, filedialog, ttk, messagebox
-from neo4j import GraphDatabase
-from openai import OpenAI
+from neo4j import GraphDatabase, READ_ACCESS
+from neo4j.exceptions import TransientError, ServiceUnavailable, SessionExpired
+from openai import OpenAI, APIConnectionError, APIStatusError, RateLimitError, InternalServerError
+import numpy as np
 import json
 import threading
 import re
@@ -9,12 +11,27 @@ import os
 import time
 import hashlib
 import pickle
+import queue
+import random
+import zlib
+import difflib
+from types import SimpleNamespace
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# DeepSeek API 配置
-client = OpenAI(
-    api_key="sk-",
-    base_url="https://api.deepseek.com",
-)
+# LLM API 配置：可配置多个OpenAI兼容端点，每个端点包含 base_url、api_key、
+# 每秒请求数 rate 以及可选的 model（该端点上代替默认模型 DEFAULT_MODEL 使用的模型名），
+# 保存在 LLM_ENDPOINTS_FILE 中
+LLM_ENDPOINTS_FILE = "llm_endpoints.json"
+DEFAULT_LLM_ENDPOINTS = [
+    {
+        "name": "deepseek",
+        "api_key": "sk-",
+        "base_url": "https://api.deepseek.com",
+        "rate": 5
+    }
+]
+DEFAULT_MODEL = "deepseek-chat"
 
 # Neo4j 配置
 NEO4J_CONFIG = {
@@ -27,6 +44,1062 @@ NEO4J_CONFIG = {
 CACHE_DIR = "extraction_cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+# 所有实体节点共享的标签，用于建立跨类型的名称索引和全文索引
+ENTITY_LABEL = "Entity"
+ENTITY_FULLTEXT_INDEX = "entity_fulltext"
+ENTITY_NAME_INDEX = "entity_name"
+
+# 被相关性预筛选跳过或降级处理的文本块审计日志
+SKIPPED_CHUNKS_LOG = os.path.join(CACHE_DIR, "skipped_chunks.jsonl")
+
+# 已确认的实体类型/关系类型整合映射，抽取时据此规范化类型名称
+TYPE_MAPPING_FILE = "type_mapping.json"
+
+# 端点尚不存在的待写入关系，跨运行保留
+PENDING_EDGES_FILE = os.path.join(CACHE_DIR, "pending_edges.json")
+
+# 已抽取文本块的MinHash索引，用于发现近似重复的块
+MINHASH_INDEX_FILE = os.path.join(CACHE_DIR, "minhash_index.pkl")
+
+# 节点重要性（PageRank）索引，以及查询结果最多显示的条数
+ENTITY_PAGERANK_INDEX = "entity_pagerank"
+RESULT_DISPLAY_LIMIT = 100
+
+class RateLimiter:
+    """
+    令牌桶限流器，rate 为每秒允许的请求数。
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        阻塞直到获得一个令牌。
+        """
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """
+        有可用令牌时取走一个并返回 True，否则立即返回 False。
+        """
+        with self.lock:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def available(self):
+        # 剩余配额占容量的比例
+        with self.lock:
+            self.refill()
+            return self.tokens / self.capacity
+
+    def wait_time(self):
+        # 距下一个令牌可用的时间
+        with self.lock:
+            self.refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+class RequestCancelled(Exception):
+    """
+    取消事件触发时，正在等待响应的请求抛出此异常。
+    """
+
+def call_cancellable(cancel_event, func, *args, **kwargs):
+    """
+    在后台线程中执行阻塞调用（如HTTP请求），cancel_event 被设置时立即抛出 RequestCancelled。
+    关闭连接并不能打断正在等待响应的请求，因此调用方不等待其完成，迟到的结果被丢弃。
+    """
+    if cancel_event is None:
+        return func(*args, **kwargs)
+        
+    outcome = {}
+    done = threading.Event()
+    
+    def run():
+        try:
+            outcome["result"] = func(*args, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+            
+    threading.Thread(target=run, daemon=True).start()
+    while not done.wait(0.05):
+        if cancel_event.is_set():
+            raise RequestCancelled("请求已取消")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+class LLMEndpoint:
+    """
+    单个OpenAI兼容端点的配置、限流器和健康状态。
+    """
+
+    def __init__(self, base_url, api_key, name=None, model=None, rate=5):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.name = name or base_url
+        self.model = model
+        self.rate = float(rate)
+        if not self.rate > 0:
+            raise ValueError(f"端点 {self.name} 的每秒请求数必须是正数")
+        self.limiter = RateLimiter(self.rate)
+        
+        self.latency = None  # 近期延迟的指数移动平均（秒）
+        self.in_flight = 0
+        self.failures = 0  # 连续失败次数
+        self.unhealthy_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def healthy(self, now=None):
+        return (now or time.monotonic()) >= self.unhealthy_until
+
+    def score(self):
+        # 剩余配额越多、近期延迟越低的端点得分越高；尚无延迟数据的端点优先尝试
+        latency = self.latency if self.latency is not None else 0.0
+        return self.limiter.available() / ((latency + 0.1) * (1 + self.in_flight))
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def record_success(self, latency):
+        with self.lock:
+            self.in_flight -= 1
+            self.failures = 0
+            self.latency = latency if self.latency is None else 0.7 * self.latency + 0.3 * latency
+
+    def record_failure(self):
+        with self.lock:
+            self.in_flight -= 1
+            self.failures += 1
+            self.errors += 1
+            # 连续失败时指数延长冷却时间，冷却期内不再分配请求
+            self.unhealthy_until = time.monotonic() + min(60.0, 2.0 ** self.failures)
+
+    def record_done(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def to_dict(self):
+        config = {"name": self.name, "base_url": self.base_url, "api_key": self.api_key, "rate": self.rate}
+        if self.model:
+            config["model"] = self.model
+        return config
+
+    def describe(self):
+        latency = f"{self.latency:.2f}s" if self.latency is not None else "-"
+        state = "正常" if self.healthy() else "冷却中"
+        return (f"{self.name}: {state}, 请求 {self.requests}, 失败 {self.errors}, "
+                f"平均延迟 {latency}")
+
+class LLMClientPool:
+    """
+    多端点LLM客户端池，接口与 OpenAI 客户端的 chat.completions.create 一致。
+    每个请求分配给剩余配额最多、近期延迟最低的健康端点；连接错误、限流和服务端错误时
+    将该端点标记为冷却并切换到其他端点。
+    """
+
+    RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+    # 请求本身有误的状态码，换端点也无法成功
+    REQUEST_ERROR_STATUS = (400, 422)
+
+    def __init__(self, endpoints, max_attempts=None, cancel_event=None):
+        self.endpoints = [
+            endpoint if isinstance(endpoint, LLMEndpoint) else LLMEndpoint(**endpoint)
+            for endpoint in endpoints
+        ]
+        if not self.endpoints:
+            raise ValueError("至少需要配置一个LLM端点")
+        self.max_attempts = max_attempts or len(self.endpoints) + 2
+        self.cancel_event = cancel_event
+        self.closed = False
+        
+        # 重试和故障切换由客户端池负责，单个客户端自身不再重试
+        self.clients = {
+            endpoint: OpenAI(api_key=endpoint.api_key, base_url=endpoint.base_url, max_retries=0)
+            for endpoint in self.endpoints
+        }
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def clone(self, cancel_event=None):
+        """
+        创建共享端点状态（限流、延迟、健康）但使用独立连接的客户端池；
+        cancel_event 被设置时其上等待响应的请求立即抛出 RequestCancelled，不影响其他调用方。
+        """
+        return LLMClientPool(self.endpoints, self.max_attempts, cancel_event=cancel_event)
+
+    def cancelled(self):
+        return self.closed or (self.cancel_event is not None and self.cancel_event.is_set())
+
+    def call(self, endpoint, request):
+        # 绑定取消事件的客户端池在后台线程中发出请求，取消时立即返回
+        api_client = self.clients[endpoint]
+        return call_cancellable(self.cancel_event, api_client.chat.completions.create, **request)
+
+    def wait(self, seconds):
+        # 绑定取消事件时，等待可被取消立即打断
+        if self.cancel_event is not None:
+            self.cancel_event.wait(seconds)
+        else:
+            time.sleep(seconds)
+
+    def acquire(self, excluded):
+        """
+        选择一个端点并占用其一个请求配额，配额不足时等待；等待期间取消则抛出 RequestCancelled。
+        """
+        while True:
+            if self.cancelled():
+                raise RequestCancelled("请求已取消")
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e not in excluded]
+            healthy = [e for e in candidates if e.healthy(now)]
+            if not healthy:
+                # 所有端点都在冷却中时等待最早恢复的端点
+                soonest = min(candidates, key=lambda e: e.unhealthy_until)
+                self.wait(min(1.0, max(0.0, soonest.unhealthy_until - now)))
+                continue
+                
+            for endpoint in sorted(healthy, key=lambda e: e.score(), reverse=True):
+                if endpoint.limiter.try_acquire():
+                    return endpoint
+                    
+            self.wait(min(1.0, min(e.limiter.wait_time() for e in healthy)))
+
+    def create(self, **kwargs):
+        last_error = None
+        excluded = set()
+        
+        for _ in range(self.max_attempts):
+            if self.cancelled():
+                break
+            # 所有端点都失败过一次后允许再次尝试（冷却结束后）
+            if len(excluded) == len(self.endpoints):
+                excluded = set()
+                
+            endpoint = self.acquire(excluded)
+            # 端点模型只替换默认模型，调用方指定的其他模型（如低成本模型）保持不变
+            request = dict(kwargs)
+            if endpoint.model and request.get("model", DEFAULT_MODEL) == DEFAULT_MODEL:
+                request["model"] = endpoint.model
+                
+            endpoint.start()
+            start = time.perf_counter()
+            try:
+                response = self.call(endpoint, request)
+            except Exception as e:
+                # 取消或主动关闭客户端池导致的错误、请求本身的错误不计入端点健康状态
+                if self.cancelled() or not self.is_endpoint_error(e):
+                    endpoint.record_done()
+                    raise
+                endpoint.record_failure()
+                excluded.add(endpoint)
+                last_error = e
+                continue
+            endpoint.record_success(time.perf_counter() - start)
+            return response
+            
+        if last_error is None:
+            raise RuntimeError("LLM客户端池已关闭")
+        raise last_error
+
+    def is_endpoint_error(self, error):
+        """
+        判断错误是否由端点本身引起（连接失败、限流、服务端错误、密钥失效、模型不存在等），
+        这类错误将端点标记为冷却并切换到其他端点。
+        """
+        if isinstance(error, self.RETRYABLE_ERRORS):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code not in self.REQUEST_ERROR_STATUS
+
+    def describe(self):
+        return "\n".join(endpoint.describe() for endpoint in self.endpoints)
+
+    def close(self):
+        self.closed = True
+        for api_client in self.clients.values():
+            api_client.close()
+
+def load_llm_endpoints(path=LLM_ENDPOINTS_FILE):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return DEFAULT_LLM_ENDPOINTS
+
+# LLM 客户端池；端点配置无法加载时使用默认端点，错误在界面创建后报告
+llm_endpoints_error = None
+try:
+    client = LLMClientPool(load_llm_endpoints())
+except Exception as e:
+    client = LLMClientPool(DEFAULT_LLM_ENDPOINTS)
+    llm_endpoints_error = str(e)
+
+def compute_graph_ranking(sources, targets, num_nodes, damping=0.85,
+                          tol=1e-10, max_iter=100, initial=None):
+    """
+    基于边列表计算节点的度和PageRank，返回 (度数组, PageRank数组, 迭代次数)。
+    sources/targets 为节点下标数组；initial 为上次的PageRank结果，用于增量更新时热启动。
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if num_nodes == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), 0
+        
+    degree = (np.bincount(sources, minlength=num_nodes)
+              + np.bincount(targets, minlength=num_nodes))
+              
+    # 同一对节点之间的多条关系只计一次
+    if len(sources):
+        pairs = np.unique(sources * num_nodes + targets)
+        sources, targets = pairs // num_nodes, pairs % num_nodes
+        
+    out_degree = np.bincount(sources, minlength=num_nodes).astype(np.float64)
+    dangling = out_degree == 0
+    edge_weight = 1.0 / out_degree[sources] if len(sources) else np.zeros(0)
+    
+    if initial is not None and np.isfinite(initial).all() and initial.sum() > 0:
+        rank = initial / initial.sum()
+    else:
+        rank = np.full(num_nodes, 1.0 / num_nodes)
+        
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        # 稀疏矩阵-向量乘: 每条边把源节点的得分按出度均分给目标节点
+        spread = np.bincount(targets, weights=rank[sources] * edge_weight, minlength=num_nodes)
+        new_rank = (1 - damping) / num_nodes + damping * (spread + rank[dangling].sum() / num_nodes)
+        delta = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if delta < tol:
+            break
+            
+    return degree, rank, iterations
+
+class StreamingToolCallParser:
+    """
+    增量解析流式返回的函数调用参数，数组中的对象一旦完整即可取出。
+    适用于 {"entities": [{...}, ...], "relations": [{...}, ...]} 形式的参数。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []  # 当前所在的容器栈: '{' 或 '['
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_key = None  # 顶层对象中最近解析到的键
+        self.current_key = None  # 当前正在读取的顶层数组对应的键
+        self.item_start = None
+
+    def feed(self, delta):
+        """
+        追加一段参数文本，返回本次新完成的 (键, 对象) 列表。
+        """
+        self.buffer += delta
+        completed = []
+
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    # 记录顶层对象中的键名
+                    if self.stack == ["{"] and self.string_start is not None:
+                        try:
+                            self.last_key = json.loads(self.buffer[self.string_start:self.pos + 1])
+                        except ValueError:
+                            self.last_key = None
+                    self.string_start = None
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif ch in "{[":
+                if ch == "[" and self.stack == ["{"]:
+                    self.current_key = self.last_key
+                elif ch == "{" and self.stack == ["{", "["]:
+                    self.item_start = self.pos
+                self.stack.append(ch)
+            elif ch in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if ch == "}" and self.stack == ["{", "["] and self.item_start is not None:
+                    try:
+                        item = json.loads(self.buffer[self.item_start:self.pos + 1])
+                        completed.append((self.current_key, item))
+                    except ValueError:
+                        pass
+                    self.item_start = None
+
+            self.pos += 1
+
+        return completed
+
+    def result(self):
+        """
+        返回完整解析后的参数；流未正常结束时返回 None。
+        """
+        try:
+            return json.loads(self.buffer)
+        except ValueError:
+            return None
+
+class TrigramIndex:
+    """
+    本地实体名称三元组索引，与Neo4j中的全文索引保持同步，
+    用于在生成Cypher之前将问题中提到的实体链接到图谱中的规范名称。
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self.entities = {}  # name -> {"labels": set, "description": str}
+        self.postings = {}  # gram -> set(name)
+        self.short_names = set()  # 短于n个字符的名称，直接按子串匹配
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text):
+        return re.sub(r'\s+', ' ', text.strip().lower())
+
+    def grams(self, text):
+        text = self.normalize(text)
+        if len(text) < self.n:
+            return {text} if text else set()
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def add(self, name, labels=(), description=None):
+        with self.lock:
+            entry = self.entities.get(name)
+            if entry is None:
+                entry = {"labels": set(), "description": None}
+                self.entities[name] = entry
+                if len(self.normalize(name)) < self.n:
+                    self.short_names.add(name)
+                else:
+                    for gram in self.grams(name):
+                        self.postings.setdefault(gram, set()).add(name)
+            entry["labels"].update(labels)
+            if description:
+                entry["description"] = description
+
+    def search(self, text, limit=10, min_score=0.5):
+        """
+        返回名称出现在文本中（允许部分差异）的实体列表，按匹配度排序。
+        匹配度为实体名称的三元组被文本覆盖的比例。
+        """
+        query_grams = self.grams(text)
+        normalized = self.normalize(text)
+        
+        with self.lock:
+            shared = Counter()
+            for gram in query_grams:
+                for name in self.postings.get(gram, ()):
+                    shared[name] += 1
+                    
+            scored = []
+            for name, count in shared.items():
+                total = len(self.grams(name))
+                score = count / total
+                if score >= min_score and (count >= 2 or total == 1):
+                    scored.append((score, name))
+                    
+            for name in self.short_names:
+                if self.normalize(name) in normalized:
+                    scored.append((1.0, name))
+                    
+            # 匹配度相同时优先更长（更具体）的名称
+            scored.sort(key=lambda x: (x[0], len(x[1])), reverse=True)
+            return [
+                {
+                    "name": name,
+                    "labels": sorted(self.entities[name]["labels"]),
+                    "score": score
+                }
+                for score, name in scored[:limit]
+            ]
+
+class PartitionedGraphWriter:
+    """
+    并行写入Neo4j的分区写入器。
+    实体按规范名称的哈希分配给固定的写入线程，同一节点只由一个线程写入，避免锁竞争；
+    关系在其端点实体提交之后才写入；瞬时错误（如死锁）按有限次数重试。
+    """
+
+    RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+    def __init__(self, driver, database, num_writers=4, batch_size=50,
+                 max_retries=5, retry_delay=0.2, on_error=None):
+        self.driver = driver
+        self.database = database
+        self.num_writers = max(1, num_writers)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.on_error = on_error
+        
+        # 尚未提交的实体写入: 规范名称 -> 事件集合
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.cancelled = threading.Event()
+        
+        self.queues = [queue.Queue() for _ in range(self.num_writers)]
+        self.threads = []
+        for i in range(self.num_writers):
+            thread = threading.Thread(target=self.worker, args=(self.queues[i],), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    @staticmethod
+    def canonical_name(name):
+        return re.sub(r'\s+', ' ', str(name).strip().lower())
+
+    def partition(self, name):
+        return zlib.crc32(self.canonical_name(name).encode('utf-8')) % self.num_writers
+
+    def submit_entity(self, name, work, *args):
+        """
+        提交实体写入，work(tx, *args) 在拥有该名称的写入线程中执行。
+        """
+        if self.cancelled.is_set():
+            return
+        key = self.canonical_name(name)
+        event = threading.Event()
+        with self.pending_lock:
+            self.pending.setdefault(key, set()).add(event)
+        self.queues[self.partition(name)].put((work, args, [], (key, event), None))
+
+    def submit_relation(self, source, target, work, *args):
+        """
+        提交关系写入，等待两个端点已提交的实体写入完成后再执行。
+        """
+        self.submit_dependent(source, (source, target), work, *args)
+
+    def submit_dependent(self, owner, names, work, *args, on_commit=None):
+        """
+        提交依赖多个实体的写入（如批量关系），在 owner 所属的写入线程中执行，
+        等待 names 中所有已提交的实体写入完成后再执行。
+        on_commit 在该写入所在事务成功提交后调用；写入失败或被取消时不调用。
+        """
+        if self.cancelled.is_set():
+            return
+        with self.pending_lock:
+            waits = []
+            for name in set(names):
+                waits.extend(self.pending.get(self.canonical_name(name), ()))
+        self.queues[self.partition(owner)].put((work, args, waits, None, on_commit))
+
+    def worker(self, task_queue):
+        with self.driver.session(database=self.database) as session:
+            while True:
+                task = task_queue.get()
+                if task is None:
+                    task_queue.task_done()
+                    break
+                    
+                # 尽量把队列中已有的任务合并到同一个事务中
+                batch = [task]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        task = task_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if task is None:
+                        stop = True
+                        break
+                    batch.append(task)
+                    
+                current = []
+                for task in batch:
+                    # 依赖尚未提交时，先提交已累积的任务，避免等待本线程自己未提交的写入
+                    waits = task[2]
+                    if any(not event.is_set() for event in waits):
+                        self.commit(session, current)
+                        current = []
+                        for event in waits:
+                            event.wait()
+                    current.append(task)
+                self.commit(session, current)
+                
+                for _ in batch:
+                    task_queue.task_done()
+                if stop:
+                    task_queue.task_done()
+                    break
+
+    def commit(self, session, tasks):
+        if not tasks:
+            return
+            
+        for attempt in range(self.max_retries + 1):
+            # 已取消时放弃尚未提交的批次，未提交的事务会被回滚
+            if self.cancelled.is_set():
+                break
+            try:
+                with session.begin_transaction() as tx:
+                    for work, args, _, _, _ in tasks:
+                        work(tx, *args)
+                    tx.commit()
+                for _, _, _, _, on_commit in tasks:
+                    if on_commit:
+                        on_commit()
+                break
+            except self.RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    self.report_error(f"写入失败（已重试 {self.max_retries} 次）: {str(e)}")
+                    break
+                # 指数退避加随机抖动，错开冲突事务的重试时间
+                self.cancelled.wait(self.retry_delay * (2 ** attempt) * (1 + random.random()))
+            except Exception as e:
+                # 批量事务中单个任务出错时逐个重写，避免连累同批的其他写入
+                if len(tasks) > 1:
+                    for task in tasks:
+                        self.commit(session, [task])
+                    return
+                self.report_error(f"写入失败: {str(e)}")
+                break
+                
+        # 无论成功与否都释放等待该实体的关系写入
+        self.release(tasks)
+
+    def release(self, tasks):
+        for _, _, _, done, _ in tasks:
+            if done is None:
+                continue
+            key, event = done
+            event.set()
+            with self.pending_lock:
+                events = self.pending.get(key)
+                if events is not None:
+                    events.discard(event)
+                    if not events:
+                        del self.pending[key]
+
+    def report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+
+    def flush(self):
+        """
+        等待所有已提交的写入任务完成。
+        """
+        for task_queue in self.queues:
+            task_queue.join()
+
+    def cancel(self):
+        """
+        取消写入：丢弃队列中尚未开始的任务，正在执行的事务完成提交或回滚后退出。
+        被丢弃的写入都来自已缓存的抽取结果，重新运行时会再次写入（MERGE是幂等的）。
+        """
+        self.cancelled.set()
+        dropped = 0
+        for task_queue in self.queues:
+            while True:
+                try:
+                    task = task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not None:
+                    self.release([task])
+                    dropped += 1
+                task_queue.task_done()
+        # 释放所有仍在等待端点的关系写入
+        with self.pending_lock:
+            for events in self.pending.values():
+                for event in events:
+                    event.set()
+        return dropped
+
+    def close(self):
+        self.flush()
+        for task_queue in self.queues:
+            task_queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+class MinHashLSHIndex:
+    """
+    文本块的MinHash签名和LSH分桶索引。
+    签名按字符shingle计算；查询时只比较与之至少有一个分带完全相同的候选块，
+    查找代价与索引规模无关。
+    """
+
+    PRIME = 4294967311  # 大于2^32的素数
+
+    def __init__(self, num_perm=64, bands=16, shingle_size=5, seed=20240501):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须是 bands 的整数倍")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        
+        # 固定种子生成哈希参数，保证签名在不同运行之间一致
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+        
+        self.keys = []  # 块哈希，下标即块编号
+        self.key_ids = {}  # 块哈希 -> 块编号
+        self.signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self.buckets = [{} for _ in range(bands)]  # 分带签名 -> 块编号列表
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.key_ids
+
+    def signature(self, text):
+        text = re.sub(r'\s+', ' ', text.strip().lower())
+        n = self.shingle_size
+        shingles = {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+        hashes = np.unique(np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)))
+        # 每一行对应一个哈希函数 (a*x + b) mod p，取所有shingle上的最小值
+        values = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % np.uint64(self.PRIME)
+        return (values.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    def band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, key, signature):
+        if key in self.key_ids:
+            return
+        index = len(self.keys)
+        if index == len(self.signatures):
+            grown = np.empty((len(self.signatures) * 2, self.num_perm), dtype=np.uint32)
+            grown[:index] = self.signatures
+            self.signatures = grown
+        self.signatures[index] = signature
+        self.keys.append(key)
+        self.key_ids[key] = index
+        for bucket, band_key in zip(self.buckets, self.band_keys(signature)):
+            bucket.setdefault(band_key, []).append(index)
+        self.dirty = True
+
+    def query(self, signature, threshold=0.9, max_candidates=256):
+        """
+        返回估计Jaccard相似度不低于 threshold 的最相似块 (块哈希, 相似度)，没有则返回 None。
+        """
+        candidates = set()
+        for bucket, band_key in zip(self.buckets, self.band_keys(signature)):
+            candidates.update(bucket.get(band_key, ()))
+            if len(candidates) >= max_candidates:
+                break
+        if not candidates:
+            return None
+            
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self.signatures[ids] == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        if similarity[best] < threshold:
+            return None
+        return self.keys[ids[best]], float(similarity[best])
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        index.dirty = False
+        return index
+
+class PendingEdgeBuffer:
+    """
+    端点尚未写入图谱的关系缓冲区，按缺失的端点名称索引。
+    端点出现后返回可以写入的关系，避免对无法匹配的关系发起写入。
+    """
+
+    def __init__(self, known_names=()):
+        self.known = set(known_names)  # 已存在或已提交写入的实体名称
+        self.pending = {}  # 缺失的端点名称 -> {(source, relation, target): 关系}
+        self.writing = {}  # 已从缓冲区取出、写入尚未确认提交的关系
+        self.writing_lock = threading.Lock()
+
+    def __len__(self):
+        return len({key for edges in self.pending.values() for key in edges})
+
+    @staticmethod
+    def edge_key(edge):
+        return (edge["source"], edge["relation"], edge["target"])
+
+    def missing(self, edge):
+        for name in (edge["source"], edge["target"]):
+            if name not in self.known:
+                return name
+        return None
+
+    def add_edge(self, edge):
+        """
+        两个端点都已知时返回 True，否则缓冲该关系并返回 False。
+        """
+        name = self.missing(edge)
+        if name is None:
+            return True
+        self.pending.setdefault(name, {})[self.edge_key(edge)] = edge
+        return False
+
+    def add_known(self, name):
+        """
+        记录实体已写入，返回因此可以写入的关系列表。
+        """
+        if name in self.known:
+            return []
+        self.known.add(name)
+        
+        resolved = []
+        for edge in self.pending.pop(name, {}).values():
+            # 另一个端点仍缺失时转挂到该端点下
+            if not self.add_edge(edge):
+                continue
+            resolved.append(edge)
+        return resolved
+
+    def start_writing(self, edges):
+        with self.writing_lock:
+            for edge in edges:
+                self.writing[self.edge_key(edge)] = edge
+
+    def written(self, edges):
+        # 写入器在事务提交后调用（可能来自写入线程）
+        with self.writing_lock:
+            for edge in edges:
+                self.writing.pop(self.edge_key(edge), None)
+
+    def unconfirmed(self):
+        with self.writing_lock:
+            return len(self.writing)
+
+    def remaining(self):
+        """
+        需要保存的关系：端点仍缺失的关系，以及写入尚未确认提交（失败或被取消）的关系。
+        """
+        with self.writing_lock:
+            edges = dict(self.writing)
+        for group in self.pending.values():
+            edges.update(group)
+        return list(edges.values())
+
+    def missing_counts(self):
+        return Counter({name: len(edges) for name, edges in self.pending.items()})
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.remaining(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load_edges(path):
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+class TypeTaxonomy:
+    """
+    开放世界假设下实体标签和关系类型的整合映射。
+    propose() 在本地对近义类型名聚类并给出映射建议，确认后的映射保存到文件，
+    抽取时通过 normalize_response() 在写入前按已确认的映射规范化类型。
+    """
+
+    # 作为前缀时不改变类型含义的通用修饰词，例如 AircraftComponent -> Component
+    GENERIC_MODIFIERS = {"aircraft", "airplane", "aviation", "flight", "plane", "general", "generic"}
+
+    def __init__(self, entity_types=None, relation_types=None):
+        self.entity_types = self.resolve_chains(entity_types or {})  # 原标签 -> 规范标签
+        self.relation_types = self.resolve_chains(relation_types or {})  # 原关系类型 -> 规范关系类型
+        
+        # 抽取时只按已确认映射中的名称（转义后）精确查找，未出现过的变体留待下次分析确认
+        self.entity_lookup = {self.sanitize(k): v for k, v in self.entity_types.items()}
+        self.relation_lookup = {self.sanitize(k): v for k, v in self.relation_types.items()}
+
+    @staticmethod
+    def resolve_chains(mapping):
+        """
+        将映射链 X->Y、Y->Z 折叠为 X->Z，使每个名称一次映射即到达最终规范名称。
+        映射到自身或成环的项被丢弃。
+        """
+        resolved = {}
+        for name, target in mapping.items():
+            seen = {name}
+            while target in mapping and target not in seen:
+                seen.add(target)
+                target = mapping[target]
+            if target != name:
+                resolved[name] = target
+        return resolved
+
+    @staticmethod
+    def sanitize(name):
+        return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+    @staticmethod
+    def tokens(name, relation=False):
+        """
+        拆分驼峰、下划线和空格，转小写并做简单的单复数归一。
+        """
+        parts = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', name)
+        parts = re.sub(r'([A-Z]+)([A-Z][a-z])', r'\1 \2', parts)
+        words = [w for w in re.split(r'[\s_\-]+', parts.lower()) if w]
+        if relation and len(words) > 1 and words[0] in ("is", "are"):
+            words = words[1:]
+            
+        normalized = []
+        for word in words:
+            if len(word) > 4 and word.endswith("ies"):
+                word = word[:-3] + "y"
+            elif len(word) > 4 and re.search(r'(?:ss|x|ch|sh)es$', word):
+                word = word[:-2]
+            elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            normalized.append(word)
+        return normalized
+
+    @classmethod
+    def key(cls, name, relation=False):
+        return "".join(cls.tokens(name, relation))
+
+    @classmethod
+    def propose(cls, counts, relation=False, similarity=0.9, preferred=()):
+        """
+        根据名称对类型聚类，返回 {原名称: 规范名称} 映射（不含未变化的名称）。
+        counts 为 {名称: 使用次数}，每个簇中使用次数最多的名称作为规范名称。
+        """
+        names = sorted(counts)
+        parent = {name: name for name in names}
+        
+        def find(name):
+            while parent[name] != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+            
+        def union(a, b):
+            parent[find(a)] = find(b)
+            
+        tokens = {name: cls.tokens(name, relation) for name in names}
+        keys = {name: "".join(tokens[name]) for name in names}
+        
+        # 归一化后相同的名称
+        by_key = {}
+        for name in names:
+            by_key.setdefault(keys[name], []).append(name)
+        for group in by_key.values():
+            for other in group[1:]:
+                union(group[0], other)
+                
+        # 仅多出通用修饰词前缀的名称
+        if not relation:
+            for name in names:
+                words = tokens[name]
+                for i in range(1, len(words)):
+                    if set(words[:i]) <= cls.GENERIC_MODIFIERS and "".join(words[i:]) in by_key:
+                        union(name, by_key["".join(words[i:])][0])
+                        break
+                        
+        # 拼写相近的名称
+        unique_keys = sorted(by_key)
+        for i, a in enumerate(unique_keys):
+            for b in unique_keys[i + 1:]:
+                if abs(len(a) - len(b)) > 2 or min(len(a), len(b)) < 5:
+                    continue
+                if difflib.SequenceMatcher(None, a, b).ratio() >= similarity:
+                    union(by_key[a][0], by_key[b][0])
+                    
+        clusters = {}
+        for name in names:
+            clusters.setdefault(find(name), []).append(name)
+            
+        mapping = {}
+        for members in clusters.values():
+            if len(members) < 2:
+                continue
+            canonical = max(members, key=lambda n: (n in preferred, counts[n], -len(n)))
+            for name in members:
+                if name != canonical:
+                    mapping[name] = canonical
+        return mapping
+
+    def normalize_entity_type(self, entity_type):
+        return self.entity_lookup.get(self.sanitize(entity_type), entity_type)
+
+    def normalize_relation_type(self, relation_type):
+        return self.relation_lookup.get(self.sanitize(relation_type), relation_type)
+
+    def normalize_response(self, data):
+        """
+        就地规范化抽取结果中的实体类型和关系类型。
+        """
+        if not self.entity_types and not self.relation_types:
+            return data
+        for entity in data.get("entities", []):
+            if "type" in entity:
+                entity["type"] = self.normalize_entity_type(entity["type"])
+        for relation in data.get("relations", []):
+            if "relation" in relation:
+                relation["relation"] = self.normalize_relation_type(relation["relation"])
+        return data
+
+    def to_dict(self):
+        return {"entity_types": self.entity_types, "relation_types": self.relation_types}
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get("entity_types"), data.get("relation_types"))
+
+    def save(self, path):
+        # 先写临时文件再替换，避免中断时留下损坏的映射文件
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
 class KnowledgeGraphApp:
     def __init__(self, root):
         self.root = root
@@ -36,8 +1109,20 @@ class KnowledgeGraphApp:
         # 初始化领域知识
         self.initialize_domain_knowledge()
         
+        # 加载已确认的类型整合映射（类型整合选项卡需要显示）
+        taxonomy_error = None
+        try:
+            self.type_taxonomy = TypeTaxonomy.load(TYPE_MAPPING_FILE)
+        except Exception as e:
+            self.type_taxonomy = TypeTaxonomy()
+            taxonomy_error = str(e)
+        
         # GUI组件初始化
         self.create_widgets()
+        if taxonomy_error:
+            self.log(f"类型映射加载错误: {taxonomy_error}")
+        if llm_endpoints_error:
+            self.log(f"LLM端点配置加载错误: {llm_endpoints_error}，已使用默认端点")
         
         # 连接到Neo4j
         self.driver = GraphDatabase.driver(
@@ -45,6 +1130,18 @@ class KnowledgeGraphApp:
             auth=NEO4J_CONFIG["auth"]
         )
         
+        # 本地实体索引（Neo4j全文索引的镜像），首次查询时从图谱加载
+        self.entity_index = TrigramIndex()
+        self.entity_index_loaded = False
+        self.indexes_ready = False
+        
+        # 抽取过程中使用的并行写入器和API客户端（停止时关闭以中断进行中的请求）
+        self.graph_writer = None
+        self.pending_edges = None
+        self.minhash_index = None
+        self.extraction_client = None
+        self.cancel_event = threading.Event()
+        
         # 处理状态
         self.is_processing = False
         self.current_filepath = None
@@ -68,6 +1165,36 @@ class KnowledgeGraphApp:
             "measured_by", "performs", "indicates", "limits", "regulates"
         ]
         
+        # 飞行技术领域的常见术语，用于在调用LLM之前快速判断文本块的相关性
+        self.domain_keywords = [
+            "飞机", "航空器", "发动机", "起落架", "襟翼", "缝翼", "副翼", "升降舵", "方向舵",
+            "扰流板", "配平", "推力", "油门", "燃油", "液压", "电源", "引气", "增压", "防冰",
+            "自动驾驶", "飞行指引", "飞行管理", "导航", "仪表", "高度", "空速", "马赫", "航向",
+            "姿态", "迎角", "失速", "起飞", "着陆", "进近", "复飞", "巡航", "爬升", "下降",
+            "滑行", "刹车", "反推", "跑道", "警告", "告警", "限制", "检查单", "程序",
+            "机组", "驾驶员", "机长", "副驾驶", "应急", "故障", "系统", "部件", "开关", "按钮",
+            "aircraft", "engine", "gear", "flap", "slat", "aileron", "elevator", "rudder",
+            "spoiler", "trim", "thrust", "throttle", "fuel", "hydraulic", "bleed", "pressur",
+            "anti-ice", "autopilot", "flight director", "fmc", "fms", "navigation", "altitude",
+            "airspeed", "mach", "heading", "attitude", "stall", "takeoff", "landing", "approach",
+            "go-around", "cruise", "climb", "descent", "taxi", "brake", "reverser", "runway",
+            "warning", "caution", "limit", "checklist", "procedure", "crew", "pilot",
+            "emergency", "failure", "apu", "knots", "psi"
+        ]
+        for entity_type in self.suggested_entity_types:
+            if entity_type.lower() not in self.domain_keywords:
+                self.domain_keywords.append(entity_type.lower())
+        
+        # 前言、目录、修订记录、空白页说明、法律声明等非技术内容的特征
+        self.boilerplate_patterns = [
+            re.compile(r'\.{4,}\s*\d+\s*$'),  # 目录中的引导点和页码
+            re.compile(r'^\s*(?:第\s*\d+\s*页|page\s+\d+|\d+\s*/\s*\d+|-\s*\d+\s*-)\s*$', re.IGNORECASE),
+            re.compile(r'目\s*录|table of contents|contents\s*$', re.IGNORECASE),
+            re.compile(r'修订(?:记录|历史|页)|有效页清单|revision|list of effective pages|highlights of change', re.IGNORECASE),
+            re.compile(r'此页有意留空|本页空白|intentionally\s+(?:left\s+)?blank', re.IGNORECASE),
+            re.compile(r'版权|保留所有权利|copyright|all rights reserved|proprietary|disclaimer|免责', re.IGNORECASE),
+        ]
+        
     def create_widgets(self):
         # 主布局使用notebook选项卡
         self.notebook = ttk.Notebook(self.root)
@@ -83,7 +1210,12 @@ class KnowledgeGraphApp:
         self.notebook.add(query_tab, text="知识查询")
         self.setup_query_tab(query_tab)
         
-        # 选项卡3: 设置
+        # 选项卡3: 类型整合
+        taxonomy_tab = ttk.Frame(self.notebook)
+        self.notebook.add(taxonomy_tab, text="类型整合")
+        self.setup_taxonomy_tab(taxonomy_tab)
+        
+        # 选项卡4: 设置
         settings_tab = ttk.Frame(self.notebook)
         self.notebook.add(settings_tab, text="设置")
         self.setup_settings_tab(settings_tab)
@@ -136,6 +1268,65 @@ class KnowledgeGraphApp:
         
         ttk.Label(overlap_frame, text="字符").pack(side=tk.LEFT)
         
+        # 并行写入选项
+        writer_frame = ttk.Frame(options_frame)
+        writer_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(writer_frame, text="写入线程数:").pack(side=tk.LEFT)
+        self.writers_var = tk.StringVar(value="4")
+        writers_entry = ttk.Entry(writer_frame, textvariable=self.writers_var, width=10)
+        writers_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 近似重复块选项
+        duplicate_frame = ttk.Frame(options_frame)
+        duplicate_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(duplicate_frame, text="近似重复块:").pack(side=tk.LEFT)
+        self.duplicate_policy_var = tk.StringVar(value="复用并按原文校验")
+        duplicate_combo = ttk.Combobox(
+            duplicate_frame, textvariable=self.duplicate_policy_var,
+            values=["复用结果", "复用并按原文校验", "不复用"], width=16, state="readonly")
+        duplicate_combo.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(duplicate_frame, text="相似度阈值:").pack(side=tk.LEFT)
+        self.duplicate_threshold_var = tk.StringVar(value="0.9")
+        duplicate_entry = ttk.Entry(duplicate_frame, textvariable=self.duplicate_threshold_var, width=10)
+        duplicate_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 相关性预筛选选项
+        prefilter_frame = ttk.Frame(options_frame)
+        prefilter_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(prefilter_frame, text="相关性阈值:").pack(side=tk.LEFT)
+        self.relevance_threshold_var = tk.StringVar(value="0.2")
+        threshold_entry = ttk.Entry(prefilter_frame, textvariable=self.relevance_threshold_var, width=10)
+        threshold_entry.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(prefilter_frame, text="(0-1，0为不筛选)  低于阈值的块:").pack(side=tk.LEFT)
+        self.low_relevance_action_var = tk.StringVar(value="跳过")
+        action_combo = ttk.Combobox(
+            prefilter_frame, textvariable=self.low_relevance_action_var,
+            values=["跳过", "使用低成本模型"], width=14, state="readonly")
+        action_combo.pack(side=tk.LEFT, padx=5)
+        
+        # 节点排名选项
+        ranking_frame = ttk.Frame(options_frame)
+        ranking_frame.pack(fill=tk.X, pady=5)
+        
+        self.update_ranking_var = tk.BooleanVar(value=True)
+        ranking_check = ttk.Checkbutton(
+            ranking_frame, text="抽取完成后更新节点排名（度和PageRank）", variable=self.update_ranking_var)
+        ranking_check.pack(side=tk.LEFT)
+        
+        # 流式抽取选项
+        stream_frame = ttk.Frame(options_frame)
+        stream_frame.pack(fill=tk.X, pady=5)
+        
+        self.stream_var = tk.BooleanVar(value=True)
+        stream_check = ttk.Checkbutton(
+            stream_frame, text="流式抽取（实体和关系解析完成即写入图谱）", variable=self.stream_var)
+        stream_check.pack(side=tk.LEFT)
+        
         # 操作按钮
         action_frame = ttk.Frame(parent)
         action_frame.pack(pady=10, fill=tk.X)
@@ -193,6 +1384,30 @@ class KnowledgeGraphApp:
             query_frame, text="执行查询", command=self.execute_query)
         self.btn_query.pack(side=tk.LEFT, padx=10)
         
+        # 批量查询
+        batch_frame = ttk.Frame(parent)
+        batch_frame.pack(pady=5, fill=tk.X)
+        
+        self.btn_batch_query = ttk.Button(
+            batch_frame, text="批量查询", command=self.execute_batch_query)
+        self.btn_batch_query.pack(side=tk.LEFT)
+        
+        ttk.Label(batch_frame, text="并发数:").pack(side=tk.LEFT, padx=(10, 0))
+        self.batch_concurrency_var = tk.StringVar(value="8")
+        concurrency_entry = ttk.Entry(batch_frame, textvariable=self.batch_concurrency_var, width=6)
+        concurrency_entry.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(batch_frame, text="每秒请求数:").pack(side=tk.LEFT, padx=(10, 0))
+        self.batch_rate_var = tk.StringVar(value="5")
+        rate_entry = ttk.Entry(batch_frame, textvariable=self.batch_rate_var, width=6)
+        rate_entry.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(batch_frame, text="(问题文件: 每行一个问题，或JSONL中的question字段)").pack(side=tk.LEFT)
+        
+        self.btn_ranking = ttk.Button(
+            batch_frame, text="更新节点排名", command=self.start_ranking_update)
+        self.btn_ranking.pack(side=tk.RIGHT, padx=10)
+        
         # 生成的Cypher显示
         cypher_frame = ttk.LabelFrame(parent, text="生成的Cypher查询")
         cypher_frame.pack(pady=10, fill=tk.X, padx=10)
@@ -209,6 +1424,34 @@ class KnowledgeGraphApp:
             results_frame, wrap=tk.WORD, width=80, height=15)
         self.query_result_area.pack(fill=tk.BOTH, expand=True)
         
+    def setup_taxonomy_tab(self, parent):
+        # 操作按钮
+        action_frame = ttk.Frame(parent)
+        action_frame.pack(pady=10, fill=tk.X)
+        
+        self.btn_analyze_types = ttk.Button(
+            action_frame, text="分析类型", command=self.start_type_analysis)
+        self.btn_analyze_types.pack(side=tk.LEFT)
+        
+        self.btn_apply_types = ttk.Button(
+            action_frame, text="应用映射", command=self.start_type_consolidation)
+        self.btn_apply_types.pack(side=tk.LEFT, padx=10)
+        
+        ttk.Label(action_frame, text="每批节点数:").pack(side=tk.LEFT)
+        self.relabel_batch_var = tk.StringVar(value="1000")
+        batch_entry = ttk.Entry(action_frame, textvariable=self.relabel_batch_var, width=10)
+        batch_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 映射编辑区：分析结果可在此审核修改，点击"应用映射"即视为确认
+        mapping_frame = ttk.LabelFrame(parent, text="类型映射（原名称 -> 规范名称，可编辑）")
+        mapping_frame.pack(pady=10, fill=tk.BOTH, expand=True, padx=10)
+        
+        self.mapping_area = scrolledtext.ScrolledText(
+            mapping_frame, wrap=tk.WORD, width=80, height=20)
+        self.mapping_area.pack(fill=tk.BOTH, expand=True)
+        self.mapping_area.insert(
+            tk.END, json.dumps(self.type_taxonomy.to_dict(), ensure_ascii=False, indent=2))
+
     def setup_settings_tab(self, parent):
         # Neo4j设置
         neo4j_frame = ttk.LabelFrame(parent, text="Neo4j设置")
@@ -259,7 +1502,7 @@ class KnowledgeGraphApp:
         apikey_frame.pack(fill=tk.X, pady=5)
         
         ttk.Label(apikey_frame, text="API Key:").pack(side=tk.LEFT)
-        self.apikey_var = tk.StringVar(value="sk-29790821bfe445b48334837e5f20bad1")
+        self.apikey_var = tk.StringVar(value=client.endpoints[0].api_key)
         apikey_entry = ttk.Entry(apikey_frame, textvariable=self.apikey_var, width=40, show="*")
         apikey_entry.pack(side=tk.LEFT, padx=5)
         
@@ -268,10 +1511,36 @@ class KnowledgeGraphApp:
         baseurl_frame.pack(fill=tk.X, pady=5)
         
         ttk.Label(baseurl_frame, text="Base URL:").pack(side=tk.LEFT)
-        self.baseurl_var = tk.StringVar(value="https://api.deepseek.com")
+        self.baseurl_var = tk.StringVar(value=client.endpoints[0].base_url)
         baseurl_entry = ttk.Entry(baseurl_frame, textvariable=self.baseurl_var, width=40)
         baseurl_entry.pack(side=tk.LEFT, padx=5)
         
+        ttk.Label(baseurl_frame, text="每秒请求数:").pack(side=tk.LEFT)
+        self.api_rate_var = tk.StringVar(value=str(client.endpoints[0].rate))
+        rate_entry = ttk.Entry(baseurl_frame, textvariable=self.api_rate_var, width=6)
+        rate_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 其他端点：请求在所有端点间按剩余配额和延迟分配，故障时自动切换
+        endpoints_frame = ttk.Frame(api_frame)
+        endpoints_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(endpoints_frame, text="其他端点 (JSON列表，字段: name, base_url, api_key, rate, model):").pack(anchor=tk.W)
+        self.endpoints_area = scrolledtext.ScrolledText(
+            endpoints_frame, wrap=tk.WORD, width=80, height=5)
+        self.endpoints_area.pack(fill=tk.X)
+        self.endpoints_area.insert(
+            tk.END, json.dumps([e.to_dict() for e in client.endpoints[1:]], ensure_ascii=False, indent=2))
+        
+        # 低相关文本块使用的模型
+        model_frame = ttk.Frame(api_frame)
+        model_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(model_frame, text="低成本模型:").pack(side=tk.LEFT)
+        self.low_cost_model_var = tk.StringVar(value="")
+        model_entry = ttk.Entry(model_frame, textvariable=self.low_cost_model_var, width=40)
+        model_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Label(model_frame, text="(留空则不降级，低相关块使用常规模型)").pack(side=tk.LEFT)
+        
         # 保存按钮
         save_frame = ttk.Frame(parent)
         save_frame.pack(pady=20)
@@ -299,14 +1568,244 @@ class KnowledgeGraphApp:
             auth=NEO4J_CONFIG["auth"]
         )
         
-        # 更新API客户端
-        client = OpenAI(
-            api_key=self.apikey_var.get(),
-            base_url=self.baseurl_var.get(),
-        )
+        # 新的数据库需要重新建立索引并重新加载本地实体索引
+        self.entity_index = TrigramIndex()
+        self.entity_index_loaded = False
+        self.indexes_ready = False
+        
+        # 更新API客户端池，主端点保留界面上未显示的字段（如 model）
+        try:
+            primary = client.endpoints[0].to_dict()
+            primary.update(
+                api_key=self.apikey_var.get(),
+                base_url=self.baseurl_var.get(),
+                rate=float(self.api_rate_var.get())
+            )
+            endpoints = [primary]
+            endpoints += json.loads(self.endpoints_area.get(1.0, tk.END).strip() or "[]")
+            new_client = LLMClientPool(endpoints)
+        except (ValueError, TypeError) as e:
+            messagebox.showerror("设置", f"API端点配置错误: {str(e)}")
+            return
+            
+        # 关闭旧的客户端池释放其连接；进行中的抽取使用各自的客户端池，不受影响
+        old_client, client = client, new_client
+        old_client.close()
+        
+        with open(LLM_ENDPOINTS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(endpoints, f, ensure_ascii=False, indent=2)
         
         messagebox.showinfo("设置", "设置已保存")
 
+    def start_type_analysis(self):
+        self.btn_analyze_types.config(state=tk.DISABLED)
+        threading.Thread(target=self.analyze_types).start()
+
+    def analyze_types(self):
+        """
+        统计图谱中的标签和关系类型，聚类近义名称并显示映射建议。
+        """
+        self.update_status("正在分析类型...")
+        
+        try:
+            with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
+                label_counts = {
+                    record["label"]: record["count"]
+                    for record in session.run(
+                        "MATCH (n) UNWIND labels(n) AS label RETURN label, count(*) AS count")
+                    if record["label"] != ENTITY_LABEL
+                }
+                relation_counts = {
+                    record["type"]: record["count"]
+                    for record in session.run(
+                        "MATCH ()-[r]->() RETURN type(r) AS type, count(*) AS count")
+                }
+                
+            # 在已确认的映射基础上合并新的建议
+            entity_types = dict(self.type_taxonomy.entity_types)
+            entity_types.update(TypeTaxonomy.propose(
+                label_counts, preferred=self.suggested_entity_types))
+            relation_types = dict(self.type_taxonomy.relation_types)
+            relation_types.update(TypeTaxonomy.propose(
+                relation_counts, relation=True, preferred=self.suggested_relation_types))
+                
+            proposal = TypeTaxonomy(entity_types, relation_types)
+            self.mapping_area.delete(1.0, tk.END)
+            self.mapping_area.insert(
+                tk.END, json.dumps(proposal.to_dict(), ensure_ascii=False, indent=2))
+                
+            self.log(f"共有 {len(label_counts)} 个标签、{len(relation_counts)} 种关系类型，"
+                     f"建议合并 {len(proposal.entity_types)} 个标签、{len(proposal.relation_types)} 种关系类型")
+            self.update_status("类型分析完成")
+            
+        except Exception as e:
+            self.log(f"类型分析错误: {str(e)}")
+            self.update_status("类型分析出错")
+            
+        finally:
+            self.btn_analyze_types.config(state=tk.NORMAL)
+
+    def start_type_consolidation(self):
+        try:
+            data = json.loads(self.mapping_area.get(1.0, tk.END))
+            taxonomy = TypeTaxonomy(data.get("entity_types"), data.get("relation_types"))
+            batch_size = int(self.relabel_batch_var.get())
+        except ValueError as e:
+            messagebox.showerror("类型整合", f"映射格式错误: {str(e)}")
+            return
+            
+        if not messagebox.askyesno(
+                "类型整合",
+                f"将合并 {len(taxonomy.entity_types)} 个标签和 "
+                f"{len(taxonomy.relation_types)} 种关系类型，确认应用？"):
+            return
+            
+        # 保存确认后的映射，之后的抽取会按此规范化类型
+        taxonomy.save(TYPE_MAPPING_FILE)
+        self.type_taxonomy = taxonomy
+        
+        self.btn_apply_types.config(state=tk.DISABLED)
+        threading.Thread(target=self.apply_type_mapping, args=(taxonomy, batch_size)).start()
+
+    def apply_type_mapping(self, taxonomy, batch_size=1000):
+        """
+        按映射分批重命名图谱中的标签和关系类型。
+        每批为一个独立事务，只处理仍使用旧名称的数据，中断后重新应用即可继续。
+        """
+        self.update_status("正在整合类型...")
+        
+        # 合并同名节点时按公共实体标签的名称索引查找
+        self.ensure_indexes()
+        
+        try:
+            with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
+                for old, new in taxonomy.entity_types.items():
+                    old_label = TypeTaxonomy.sanitize(old)
+                    new_label = TypeTaxonomy.sanitize(new)
+                    if old_label == new_label:
+                        continue
+                    merged = self.merge_relabeled_nodes(session, old_label, new_label, batch_size)
+                    moved = self.run_batched(
+                        session,
+                        f"""
+                        MATCH (n:`{old_label}`)
+                        WHERE NOT EXISTS {{
+                            MATCH (t:{ENTITY_LABEL} {{name: n.name}})
+                            WHERE t:`{new_label}` AND NOT t:`{old_label}`
+                        }}
+                        WITH n LIMIT $batch_size
+                        SET n:`{new_label}`
+                        REMOVE n:`{old_label}`
+                        RETURN count(n) AS updated
+                        """,
+                        batch_size
+                    )
+                    self.log(f"标签 {old_label} -> {new_label}: {moved} 个节点，"
+                             f"{merged} 个节点并入已有的同名节点")
+                    
+                for old, new in taxonomy.relation_types.items():
+                    old_type = TypeTaxonomy.sanitize(old)
+                    new_type = TypeTaxonomy.sanitize(new)
+                    if old_type == new_type:
+                        continue
+                    # 关系类型不可修改，需新建关系并删除旧关系
+                    moved = self.run_batched(
+                        session,
+                        f"""
+                        MATCH (a)-[r:`{old_type}`]->(b)
+                        WITH a, r, b LIMIT $batch_size
+                        MERGE (a)-[n:`{new_type}`]->(b)
+                        SET n += properties(r)
+                        DELETE r
+                        RETURN count(*) AS updated
+                        """,
+                        batch_size
+                    )
+                    self.log(f"关系类型 {old_type} -> {new_type}: {moved} 条关系")
+                    
+            self.log(f"类型整合完成，映射已保存到 {TYPE_MAPPING_FILE}")
+            self.update_status("类型整合完成")
+            
+        except Exception as e:
+            self.log(f"类型整合错误: {str(e)}")
+            self.update_status("类型整合出错，可重新应用映射以继续")
+            
+        finally:
+            self.btn_apply_types.config(state=tk.NORMAL)
+
+    def merge_relabeled_nodes(self, session, old_label, new_label, batch_size):
+        """
+        将旧标签下与新标签节点同名的节点并入后者：逐个关系类型迁移关系，
+        再补充缺少的属性并删除旧节点，避免改标签后出现重复实体。
+        每批为一个独立事务，只处理仍带旧标签的数据，中断后可继续。返回合并的节点数。
+        """
+        same_name = (
+            f"MATCH (t:{ENTITY_LABEL} {{name: o.name}}) "
+            f"WHERE t:`{new_label}` AND NOT t:`{old_label}`"
+        )
+        
+        # 关系类型不能参数化，按旧节点上出现的每种类型分别迁移
+        rel_types = [
+            record["type"] for record in session.run(
+                f"MATCH (:`{old_label}`)-[r]-() RETURN DISTINCT type(r) AS type")
+        ]
+        for rel_type in rel_types:
+            self.run_batched(
+                session,
+                f"""
+                MATCH (o:`{old_label}`)-[r:`{rel_type}`]->(b)
+                {same_name}
+                WITH o, r, b, t LIMIT $batch_size
+                WITH r, t, CASE WHEN b = o THEN t ELSE b END AS other
+                MERGE (t)-[n:`{rel_type}`]->(other)
+                SET n += properties(r)
+                DELETE r
+                RETURN count(*) AS updated
+                """,
+                batch_size
+            )
+            self.run_batched(
+                session,
+                f"""
+                MATCH (a)-[r:`{rel_type}`]->(o:`{old_label}`)
+                {same_name}
+                WITH a, r, t LIMIT $batch_size
+                MERGE (a)-[n:`{rel_type}`]->(t)
+                SET n += properties(r)
+                DELETE r
+                RETURN count(*) AS updated
+                """,
+                batch_size
+            )
+            
+        # 关系迁移完成后合并属性（已有节点的值优先）并删除旧节点
+        return self.run_batched(
+            session,
+            f"""
+            MATCH (o:`{old_label}`) WHERE NOT EXISTS {{ (o)--() }}
+            {same_name}
+            WITH o, t LIMIT $batch_size
+            WITH o, t, properties(t) AS kept
+            SET t += properties(o)
+            SET t += kept
+            DELETE o
+            RETURN count(*) AS updated
+            """,
+            batch_size
+        )
+
+    @staticmethod
+    def run_batched(session, query, batch_size):
+        # 重复执行分批写入查询直到没有可更新的数据，返回更新总数
+        total = 0
+        while True:
+            record = session.execute_write(
+                lambda tx: tx.run(query, batch_size=batch_size).single())
+            updated = record["updated"] if record else 0
+            if updated == 0:
+                return total
+            total += updated
+
     def select_file(self):
         filepath = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
         if filepath:
@@ -336,13 +1835,31 @@ class KnowledgeGraphApp:
             "entity_types": set()
         }
         
+        # 每次运行使用独立的取消事件和API客户端
+        self.cancel_event = threading.Event()
+        self.extraction_client = client.clone(self.cancel_event)
+        
         # 在单独的线程中开始处理
         threading.Thread(target=self.process_file, args=(self.current_filepath,)).start()
 
     def stop_extraction(self):
         self.is_processing = False
+        self.cancel_event.set()
         self.btn_stop.config(state=tk.DISABLED)
         self.log("正在停止抽取过程...")
+        
+        # 等待响应的请求已因取消事件立即返回；关闭本次运行的API客户端以释放其连接
+        if self.extraction_client:
+            try:
+                self.extraction_client.close()
+            except Exception as e:
+                self.log(f"关闭API连接错误: {str(e)}")
+                
+        # 丢弃尚未开始的图谱写入
+        if self.graph_writer:
+            dropped = self.graph_writer.cancel()
+            if dropped:
+                self.log(f"已丢弃 {dropped} 个未执行的写入任务，重新运行时将从缓存恢复")
 
     def process_file(self, filepath):
         self.update_status("正在处理文件...")
@@ -361,6 +1878,59 @@ class KnowledgeGraphApp:
                 chunk_size = 5000
                 overlap = 500
             
+            stream = self.stream_var.get()
+            
+            # 获取预筛选参数
+            try:
+                relevance_threshold = float(self.relevance_threshold_var.get())
+            except ValueError:
+                self.log("错误: 相关性阈值必须是数字。使用默认值。")
+                relevance_threshold = 0.2
+            skip_low_relevance = self.low_relevance_action_var.get() == "跳过"
+            default_model = DEFAULT_MODEL
+            low_cost_model = self.low_cost_model_var.get().strip()
+            if not skip_low_relevance and low_cost_model in ("", default_model):
+                # 未配置比常规模型更便宜的模型时降级没有意义，低相关块照常抽取
+                self.log("未配置低成本模型，低相关块将使用常规模型抽取")
+                relevance_threshold = 0
+            skipped_chunks = 0
+            downgraded_chunks = 0
+            
+            # 获取近似重复块参数
+            duplicate_policy = self.duplicate_policy_var.get()
+            try:
+                duplicate_threshold = float(self.duplicate_threshold_var.get())
+            except ValueError:
+                self.log("错误: 相似度阈值必须是数字。使用默认值。")
+                duplicate_threshold = 0.9
+            reused_chunks = 0
+            if self.minhash_index is None:
+                try:
+                    self.minhash_index = MinHashLSHIndex.load(MINHASH_INDEX_FILE)
+                except Exception as e:
+                    self.log(f"MinHash索引加载错误: {str(e)}")
+                    self.minhash_index = MinHashLSHIndex()
+            
+            # 确保实体名称索引和全文索引存在
+            self.ensure_indexes()
+            
+            # 启动分区并行写入器
+            try:
+                num_writers = int(self.writers_var.get())
+            except ValueError:
+                self.log("错误: 写入线程数必须是整数。使用默认值。")
+                num_writers = 4
+            self.graph_writer = PartitionedGraphWriter(
+                self.driver,
+                NEO4J_CONFIG["database"],
+                num_writers=num_writers,
+                on_error=lambda message: self.log(f"Neo4j错误: {message}")
+            )
+            
+            # 加载图谱中已有的实体名称和上次运行遗留的待写入关系
+            self.pending_edges = PendingEdgeBuffer(self.load_entity_names())
+            self.restore_pending_edges()
+            
             # 将文本拆分为语义块
             chunks = self.split_text_semantic(text, chunk_size, overlap)
             total_chunks = len(chunks)
@@ -379,7 +1949,7 @@ class KnowledgeGraphApp:
             
             # 处理每个块
             for i, chunk in enumerate(chunks):
-                if not self.is_processing:
+                if not self.is_processing or self.cancel_event.is_set():
                     break
                     
                 self.update_status(f"处理段落 {i+1}/{total_chunks}")
@@ -390,48 +1960,83 @@ class KnowledgeGraphApp:
                 chunk_hash = hashlib.md5(chunk.encode('utf-8')).hexdigest()
                 cache_file = os.path.join(CACHE_DIR, f"{chunk_hash}.pkl")
                 
+                # 未缓存的块先查找近似重复的已抽取块，按策略复用其结果
+                signature = None
+                reused = None
+                if not os.path.exists(cache_file):
+                    signature = self.minhash_index.signature(chunk)
+                    if duplicate_policy != "不复用":
+                        reused = self.reuse_near_duplicate(
+                            i, chunk, signature, duplicate_policy, duplicate_threshold)
+                        if reused is not None:
+                            reused_chunks += 1
+                
+                # 未缓存的块先做本地相关性预筛选，避免在无关内容上调用LLM
+                model = default_model
+                if relevance_threshold > 0 and reused is None and not os.path.exists(cache_file):
+                    score = self.score_chunk_relevance(chunk, context)
+                    if score < relevance_threshold:
+                        action = "skip" if skip_low_relevance else "low_cost_model"
+                        self.record_skipped_chunk(filepath, i, chunk_hash, chunk, score, action)
+                        if skip_low_relevance:
+                            self.log(f"块 {i+1} 相关性 {score:.2f} 低于阈值，已跳过")
+                            skipped_chunks += 1
+                            continue
+                        model = low_cost_model
+                        self.log(f"块 {i+1} 相关性 {score:.2f} 低于阈值，使用模型 {model}")
+                        downgraded_chunks += 1
+                
+                # 流式模式下，每个实体和关系在解析完成后立即写入，无需等待整个响应
+                streamed = False
+                on_item = None
+                if stream:
+                    on_item = lambda kind, item: self.handle_streamed_item(kind, item, context)
+                
+                # 复用的结果不缓存，也不作为其他块的复用来源，以免被当作真实抽取结果
+                if reused is not None:
+                    response = reused
+                    
                 # 检查是否有缓存的结果
-                if os.path.exists(cache_file):
+                elif os.path.exists(cache_file):
                     try:
                         with open(cache_file, 'rb') as f:
                             response = pickle.load(f)
                             self.log(f"块 {i+1} 使用缓存结果")
                     except Exception as e:
                         self.log(f"缓存加载错误: {str(e)}")
-                        response = self.extract_entities_relations(chunk, context)
+                        response = self.extract_entities_relations(
+                            chunk, context, stream=stream, on_item=on_item, model=model)
+                        streamed = stream
                         
                         # 缓存结果
-                        with open(cache_file, 'wb') as f:
-                            pickle.dump(response, f)
+                        self.save_cache(cache_file, response)
                 else:
                     # 使用上下文提取实体和关系
-                    response = self.extract_entities_relations(chunk, context)
+                    response = self.extract_entities_relations(
+                        chunk, context, stream=stream, on_item=on_item, model=model)
+                    streamed = stream
                     
-                    # 缓存结果
-                    with open(cache_file, 'wb') as f:
-                        pickle.dump(response, f)
+                    # 缓存结果；低成本模型的结果不缓存，以便之后用常规模型重新抽取
+                    if model == default_model:
+                        self.save_cache(cache_file, response)
+                
+                # 停止时丢弃未完成块的结果，重新运行时该块会重新抽取
+                if self.cancel_event.is_set():
+                    break
                 
-                if response:
+                # 已抽取的块加入MinHash索引，供后续近似重复块复用（复用、不完整和低成本模型的结果除外）
+                if (response is not None and not response.get("partial") and reused is None
+                        and model == default_model and chunk_hash not in self.minhash_index):
+                    if signature is None:
+                        signature = self.minhash_index.signature(chunk)
+                    self.minhash_index.add(chunk_hash, signature)
+                
+                if response and not streamed:
+                    # 按已确认的映射规范化类型名称
+                    self.type_taxonomy.normalize_response(response)
+                    
                     # 使用新的实体和关系更新上下文
-                    for entity in response.get("entities", []):
-                        context["entities"][entity["name"]] = entity["type"]
-                        
-                        # 更新实体类型集合（开放世界假设）
-                        if entity["type"] not in context["entity_types"]:
-                            context["entity_types"].append(entity["type"])
-                            self.log(f"发现新实体类型: {entity['type']}")
-                        
-                    for relation in response.get("relations", []):
-                        context["relations"].add((
-                            relation["source"], 
-                            relation["relation"], 
-                            relation["target"]
-                        ))
-                        
-                        # 更新关系类型集合（开放世界假设）
-                        if relation["relation"] not in context["relation_types"]:
-                            context["relation_types"].append(relation["relation"])
-                            self.log(f"发现新关系类型: {relation['relation']}")
+                    self.update_context(context, response)
                     
                     # 保存到Neo4j
                     self.save_to_neo4j(response)
@@ -440,7 +2045,21 @@ class KnowledgeGraphApp:
                     self.update_results(response)
                 
                 # 避免频率限制
-                time.sleep(0.5)
+                self.cancel_event.wait(0.5)
+            
+            # 等待所有写入完成
+            self.update_status("正在写入图谱...")
+            self.graph_writer.flush()
+            
+            # 报告并保存端点始终未出现的关系，下次运行时继续解析
+            self.report_pending_edges()
+            
+            # 增量更新节点排名
+            if self.is_processing and self.update_ranking_var.get():
+                self.update_status("正在更新节点排名...")
+                self.update_graph_ranking()
+            
+            self.log("API端点状态:\n" + client.describe())
             
             if self.is_processing:
                 self.update_status("处理完成")
@@ -450,20 +2069,341 @@ class KnowledgeGraphApp:
                 self.log(f"共抽取 {len(self.extracted_data['entities'])} 个实体")
                 self.log(f"共抽取 {len(self.extracted_data['relations'])} 条关系")
                 self.log(f"实体类型: {', '.join(list(self.extracted_data['entity_types']))}")
+                if skipped_chunks or downgraded_chunks:
+                    self.log(f"预筛选跳过 {skipped_chunks} 个块，降级处理 {downgraded_chunks} 个块，"
+                             f"详见 {SKIPPED_CHUNKS_LOG}")
+                self.log(f"近似重复块复用 {reused_chunks} 个，MinHash索引共 {len(self.minhash_index)} 个块")
             else:
                 self.update_status("处理已中止")
                 self.log("知识图谱构建已中止")
+                self.log(f"中止前已抽取 {len(self.extracted_data['entities'])} 个实体、"
+                         f"{len(self.extracted_data['relations'])} 条关系；"
+                         f"已完成的块结果已缓存，重新运行同一文件即可继续")
                 
         except Exception as e:
             self.log(f"错误: {str(e)}")
             self.update_status("处理出错")
             
         finally:
+            if self.graph_writer:
+                self.graph_writer.close()
+                self.graph_writer = None
+            # 写入器关闭后保存待写入关系，出错或中止时未确认写入的关系同样保留到下次运行
+            if self.pending_edges is not None:
+                try:
+                    self.pending_edges.save(PENDING_EDGES_FILE)
+                except Exception as e:
+                    self.log(f"待写入关系保存错误: {str(e)}")
+                self.pending_edges = None
+            if self.minhash_index is not None and self.minhash_index.dirty:
+                try:
+                    self.minhash_index.save(MINHASH_INDEX_FILE)
+                except Exception as e:
+                    self.log(f"MinHash索引保存错误: {str(e)}")
+            if self.extraction_client:
+                self.extraction_client.close()
+                self.extraction_client = None
             self.is_processing = False
             self.btn_extract.config(state=tk.NORMAL)
             self.btn_stop.config(state=tk.DISABLED)
             self.progress_bar["value"] = 0
 
+    def start_ranking_update(self):
+        self.btn_ranking.config(state=tk.DISABLED)
+        
+        def run():
+            try:
+                self.update_status("正在更新节点排名...")
+                self.update_graph_ranking()
+                self.update_status("节点排名已更新")
+            finally:
+                self.btn_ranking.config(state=tk.NORMAL)
+                
+        threading.Thread(target=run).start()
+
+    def update_graph_ranking(self, batch_size=5000):
+        """
+        一次性读取图谱邻接关系，计算度和PageRank并分批写回节点属性。
+        以节点上已有的PageRank作为初始值，抽取后重算只需少量迭代，且只写回变化的节点。
+        """
+        try:
+            start = time.perf_counter()
+            with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
+                session.run(
+                    f"CREATE INDEX {ENTITY_PAGERANK_INDEX} IF NOT EXISTS "
+                    f"FOR (n:{ENTITY_LABEL}) ON (n.pagerank)"
+                ).consume()
+                
+                ids = []
+                old_rank = []
+                old_degree = []
+                for record in session.run(
+                        f"""
+                        MATCH (n:{ENTITY_LABEL})
+                        RETURN elementId(n) AS id, n.pagerank AS pagerank, n.degree AS degree
+                        """):
+                    ids.append(record["id"])
+                    old_rank.append(record["pagerank"] if record["pagerank"] is not None else np.nan)
+                    old_degree.append(record["degree"] if record["degree"] is not None else -1)
+                index = {node_id: i for i, node_id in enumerate(ids)}
+                
+                # 抽取进行中时，两次查询之间可能有新节点写入，其关系留到下次更新时计入
+                sources = []
+                targets = []
+                for record in session.run(
+                        f"""
+                        MATCH (a:{ENTITY_LABEL})-[]->(b:{ENTITY_LABEL})
+                        RETURN elementId(a) AS source, elementId(b) AS target
+                        """):
+                    source = index.get(record["source"])
+                    target = index.get(record["target"])
+                    if source is None or target is None:
+                        continue
+                    sources.append(source)
+                    targets.append(target)
+                    
+                num_nodes = len(ids)
+                old_rank = np.array(old_rank, dtype=np.float64)
+                old_degree = np.array(old_degree, dtype=np.int64)
+                
+                # 新节点以均值作为初始值参与热启动
+                initial = None
+                known = ~np.isnan(old_rank)
+                if num_nodes and known.any():
+                    initial = np.where(known, old_rank, old_rank[known].mean())
+                    
+                degree, rank, iterations = compute_graph_ranking(
+                    sources, targets, num_nodes, initial=initial)
+                    
+                # 只写回有变化的节点
+                changed = np.flatnonzero(
+                    (degree != old_degree) | ~known
+                    | (np.abs(rank - np.nan_to_num(old_rank)) > 1e-9))
+                for begin in range(0, len(changed), batch_size):
+                    rows = [
+                        {"id": ids[i], "degree": int(degree[i]), "pagerank": float(rank[i])}
+                        for i in changed[begin:begin + batch_size]
+                    ]
+                    session.execute_write(self.write_ranking_batch, rows)
+                    
+            self.log(f"节点排名已更新: {num_nodes} 个节点，{len(sources)} 条关系，"
+                     f"迭代 {iterations} 次，写回 {len(changed)} 个节点，"
+                     f"耗时 {time.perf_counter() - start:.2f}s")
+                     
+        except Exception as e:
+            self.log(f"节点排名更新错误: {str(e)}")
+
+    @staticmethod
+    def write_ranking_batch(tx, rows):
+        tx.run(
+            """
+            UNWIND $rows AS row
+            MATCH (n) WHERE elementId(n) = row.id
+            SET n.degree = row.degree, n.pagerank = row.pagerank
+            """,
+            rows=rows
+        )
+
+    def load_entity_names(self):
+        """
+        读取图谱中已有的实体名称。
+        """
+        try:
+            with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
+                result = session.run(f"MATCH (n:{ENTITY_LABEL}) RETURN n.name AS name")
+                return {record["name"] for record in result}
+        except Exception as e:
+            self.log(f"实体名称加载错误: {str(e)}")
+            return set()
+
+    def restore_pending_edges(self):
+        """
+        载入上次运行遗留的待写入关系，端点已存在的立即写入。
+        """
+        try:
+            edges = PendingEdgeBuffer.load_edges(PENDING_EDGES_FILE)
+        except Exception as e:
+            self.log(f"待写入关系加载错误: {str(e)}")
+            return
+            
+        resolved = [edge for edge in edges if self.pending_edges.add_edge(edge)]
+        if resolved:
+            try:
+                with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
+                    self.write_relations_bulk(session, resolved)
+            except Exception as e:
+                self.log(f"Neo4j错误: {str(e)}")
+        if edges:
+            self.log(f"载入 {len(edges)} 条待写入关系，其中 {len(resolved)} 条的端点已存在")
+
+    def report_pending_edges(self):
+        if self.pending_edges is None:
+            return
+            
+        count = len(self.pending_edges)
+        unconfirmed = self.pending_edges.unconfirmed()
+        if unconfirmed:
+            self.log(f"{unconfirmed} 条已解析的关系未能确认写入，将保存到 {PENDING_EDGES_FILE} 下次重试")
+        if count:
+            missing = self.pending_edges.missing_counts().most_common(10)
+            self.log(f"{count} 条关系的端点尚未出现，将保存到 {PENDING_EDGES_FILE}，"
+                     f"端点出现后自动写入")
+            self.log("缺失最多的端点: " + ", ".join(f"{name} ({n})" for name, n in missing))
+
+    def reuse_near_duplicate(self, index, chunk, signature, policy, threshold, min_kept=0.5):
+        """
+        查找与当前块近似重复的已抽取块，按策略返回可复用的抽取结果，没有则返回 None。
+        "复用结果" 直接使用相似块的结果；"复用并按原文校验" 只保留名称出现在当前块中的实体，
+        以及两个端点都保留下来或出现在当前块中的关系。校验后保留的实体少于 min_kept 比例时
+        说明两块内容差异较大，返回 None 改由LLM抽取。
+        """
+        match = self.minhash_index.query(signature, threshold)
+        if match is None:
+            return None
+            
+        similar_hash, similarity = match
+        similar_file = os.path.join(CACHE_DIR, f"{similar_hash}.pkl")
+        try:
+            with open(similar_file, 'rb') as f:
+                response = pickle.load(f)
+        except Exception:
+            return None
+        if not response:
+            return None
+            
+        if policy == "复用并按原文校验":
+            text = chunk.lower()
+            entities = [
+                entity for entity in response.get("entities", [])
+                if entity.get("name", "").lower() in text
+            ]
+            names = {entity["name"] for entity in entities}
+            relations = [
+                relation for relation in response.get("relations", [])
+                if all(
+                    relation.get(end) in names or str(relation.get(end, "")).lower() in text
+                    for end in ("source", "target")
+                )
+            ]
+            source_count = len(response.get("entities", []))
+            if not entities or len(entities) < min_kept * source_count:
+                self.log(f"块 {index+1} 与已抽取块相似度 {similarity:.2f}，但校验后仅保留 "
+                         f"{len(entities)}/{source_count} 个实体，改用LLM抽取")
+                return None
+            response = {"entities": entities, "relations": relations}
+            
+        self.log(f"块 {index+1} 与已抽取块相似度 {similarity:.2f}，复用其结果"
+                 f"（{len(response.get('entities', []))} 个实体，"
+                 f"{len(response.get('relations', []))} 条关系）")
+        return response
+
+    def save_cache(self, cache_file, response):
+        """
+        缓存抽取结果。失败、被中止或流式响应被截断的结果不缓存，以便重新运行时重新抽取；
+        先写临时文件再替换，避免中断时留下不完整的缓存文件。
+        """
+        if response is None or response.get("partial") or self.cancel_event.is_set():
+            return
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(response, f)
+        os.replace(tmp_file, cache_file)
+
+    def update_context(self, context, data):
+        """
+        使用新抽取的实体和关系更新上下文窗口。
+        """
+        for entity in data.get("entities", []):
+            context["entities"][entity["name"]] = entity["type"]
+            
+            # 更新实体类型集合（开放世界假设）
+            if entity["type"] not in context["entity_types"]:
+                context["entity_types"].append(entity["type"])
+                self.log(f"发现新实体类型: {entity['type']}")
+            
+        for relation in data.get("relations", []):
+            context["relations"].add((
+                relation["source"], 
+                relation["relation"], 
+                relation["target"]
+            ))
+            
+            # 更新关系类型集合（开放世界假设）
+            if relation["relation"] not in context["relation_types"]:
+                context["relation_types"].append(relation["relation"])
+                self.log(f"发现新关系类型: {relation['relation']}")
+
+    def handle_streamed_item(self, kind, item, context):
+        """
+        处理流式解析出的单个实体或关系：更新上下文、写入Neo4j并刷新界面。
+        """
+        if kind == "entities":
+            if "name" not in item or "type" not in item:
+                return
+        elif kind == "relations":
+            if "source" not in item or "target" not in item or "relation" not in item:
+                return
+        else:
+            return
+            
+        data = self.type_taxonomy.normalize_response({kind: [item]})
+        self.update_context(context, data)
+        self.save_to_neo4j(data)
+        self.update_results(data)
+
+    def score_chunk_relevance(self, chunk, context=None):
+        """
+        基于领域术语、已知实体名称和非技术内容特征为文本块打分(0-1)。
+        """
+        text = chunk.lower()
+        if len(re.sub(r'\s', '', text)) < 50:
+            return 0.0
+            
+        # 领域术语命中次数（每个术语最多计5次，避免单个词主导得分）
+        weight = 0
+        for keyword in self.domain_keywords:
+            weight += min(text.count(keyword), 5)
+            
+        # 已知实体名称的命中更能说明文本与已抽取内容相关
+        if context and context["entities"]:
+            for name in context["entities"]:
+                if len(name) >= 2 and name.lower() in text:
+                    weight += 2
+                    
+        # 按每千字符的命中密度计分
+        density = weight / max(1.0, len(text) / 1000)
+        score = min(1.0, density / 10)
+        
+        # 目录、修订记录等行所占比例越高，得分越低
+        lines = [line for line in chunk.splitlines() if line.strip()]
+        if lines:
+            boilerplate_lines = sum(
+                1 for line in lines
+                if any(pattern.search(line) for pattern in self.boilerplate_patterns)
+            )
+            score *= 1 - boilerplate_lines / len(lines)
+            
+        return score
+
+    def record_skipped_chunk(self, filepath, index, chunk_hash, chunk, score, action):
+        """
+        将低相关文本块写入审计日志。
+        """
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "file": filepath,
+            "chunk": index + 1,
+            "hash": chunk_hash,
+            "score": round(score, 4),
+            "action": action,
+            "preview": chunk[:200]
+        }
+        try:
+            with open(SKIPPED_CHUNKS_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            self.log(f"审计日志写入错误: {str(e)}")
+
     def split_text_semantic(self, text, max_length=5000, overlap=500):
         """
         将文本分割成语义块，尝试保留段落和章节。
@@ -497,9 +2437,11 @@ class KnowledgeGraphApp:
             
         return chunks
 
-    def extract_entities_relations(self, text, context=None):
+    def extract_entities_relations(self, text, context=None, stream=False, on_item=None, model=DEFAULT_MODEL):
         """
         使用领域特定提示和上下文提取实体和关系。
+        stream为True时以流式方式接收函数调用参数，每个实体或关系对象
+        解析完成后立即通过 on_item(kind, item) 回调，kind 为 "entities" 或 "relations"。
         """
         # 为提示准备上下文
         context_info = ""
@@ -590,26 +2532,177 @@ class KnowledgeGraphApp:
             }
         }]
 
+        # 抽取过程中使用本次运行的客户端池，其请求绑定取消事件，停止时立即返回
+        api_client = self.extraction_client or client
+        
         try:
-            response = client.chat.completions.create(
-                model="deepseek-chat",
+            response = api_client.chat.completions.create(
+                model=model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"请分析以下航空领域文本并提取实体和关系:\n\n{text}"}
                 ],
                 tools=tools,
-                tool_choice={"type": "function", "function": {"name": "extract_entities_relations"}}
+                tool_choice={"type": "function", "function": {"name": "extract_entities_relations"}},
+                stream=stream
             )
 
+            if stream:
+                return self.consume_tool_call_stream(response, on_item)
+
             if response.choices[0].message.tool_calls:
                 args = json.loads(response.choices[0].message.tool_calls[0].function.arguments)
                 return args
                 
         except Exception as e:
-            self.log(f"抽取错误: {str(e)}")
+            # 停止抽取导致的取消和连接错误无需报告
+            if not self.cancel_event.is_set():
+                self.log(f"抽取错误: {str(e)}")
             
         return None
 
+    def consume_tool_call_stream(self, response, on_item=None):
+        """
+        读取流式响应中的函数调用参数，增量解析并回调已完成的对象。
+        """
+        parser = StreamingToolCallParser()
+        items = {"entities": [], "relations": []}
+        
+        for chunk in response:
+            # 停止抽取时立即关闭流，丢弃未完成的部分
+            if self.cancel_event.is_set():
+                response.close()
+                return None
+            if not chunk.choices:
+                continue
+            tool_calls = chunk.choices[0].delta.tool_calls
+            if not tool_calls or tool_calls[0].index != 0:
+                continue
+            function = tool_calls[0].function
+            if not function or not function.arguments:
+                continue
+                
+            for kind, item in parser.feed(function.arguments):
+                if kind not in items:
+                    continue
+                items[kind].append(item)
+                if on_item:
+                    on_item(kind, item)
+        
+        # 优先返回完整解析的参数；流被截断时返回已解析出的部分，并标记为不完整（不缓存、不索引）
+        args = parser.result()
+        if args is None and (items["entities"] or items["relations"]):
+            self.log("流式响应不完整，仅保留已解析的部分结果，重新运行时该块会重新抽取")
+            args = dict(items, partial=True)
+        return args
+
+    def ensure_indexes(self):
+        """
+        创建实体名称索引和全文索引，并为旧数据补充公共实体标签。
+        """
+        if self.indexes_ready:
+            return
+            
+        try:
+            with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
+                session.run(
+                    f"CREATE INDEX {ENTITY_NAME_INDEX} IF NOT EXISTS "
+                    f"FOR (n:{ENTITY_LABEL}) ON (n.name)"
+                ).consume()
+                session.run(
+                    f"CREATE FULLTEXT INDEX {ENTITY_FULLTEXT_INDEX} IF NOT EXISTS "
+                    f"FOR (n:{ENTITY_LABEL}) ON EACH [n.name, n.description]"
+                ).consume()
+                
+                # 分批为之前写入的实体补充公共标签
+                backfilled = 0
+                while True:
+                    record = session.run(
+                        f"""
+                        MATCH (n) WHERE n.name IS NOT NULL AND NOT n:{ENTITY_LABEL}
+                        WITH n LIMIT 10000
+                        SET n:{ENTITY_LABEL}
+                        RETURN count(n) AS updated
+                        """
+                    ).single()
+                    if not record or record["updated"] == 0:
+                        break
+                    backfilled += record["updated"]
+                    
+            # 补充标签前加载的本地实体索引缺少这些实体，需要重新加载
+            if backfilled:
+                self.entity_index_loaded = False
+            self.indexes_ready = True
+        except Exception as e:
+            self.log(f"索引创建错误: {str(e)}")
+
+    def load_entity_index(self):
+        """
+        从Neo4j加载所有实体到本地三元组索引。
+        只有索引和公共标签就绪且加载到实体时才标记为已加载，否则下次链接时重试。
+        """
+        # 旧数据补充公共标签之前按标签加载会遗漏实体
+        self.ensure_indexes()
+        
+        try:
+            loaded = 0
+            with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
+                result = session.run(
+                    f"""
+                    MATCH (n:{ENTITY_LABEL})
+                    RETURN n.name AS name,
+                           [l IN labels(n) WHERE l <> '{ENTITY_LABEL}'] AS labels,
+                           n.description AS description
+                    """
+                )
+                for record in result:
+                    self.entity_index.add(record["name"], record["labels"], record["description"])
+                    loaded += 1
+            self.entity_index_loaded = self.indexes_ready and loaded > 0
+        except Exception as e:
+            self.log(f"实体索引加载错误: {str(e)}")
+
+    def link_entities(self, question, limit=10):
+        """
+        将问题中提到的实体链接到图谱中的规范名称和标签。
+        先查本地三元组索引，再用Neo4j全文索引补充。
+        """
+        if not self.entity_index_loaded:
+            self.load_entity_index()
+            
+        matches = {}
+        for match in self.entity_index.search(question, limit=limit):
+            matches[match["name"]] = match
+            
+        # Lucene查询语法中的特殊字符需要转义
+        lucene_query = re.sub(r'([+\-&|!(){}\[\]^"~*?:\\/])', r'\\\1', question).strip()
+        if lucene_query and len(matches) < limit:
+            try:
+                with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
+                    result = session.run(
+                        f"""
+                        CALL db.index.fulltext.queryNodes('{ENTITY_FULLTEXT_INDEX}', $query)
+                        YIELD node, score
+                        RETURN node.name AS name,
+                               [l IN labels(node) WHERE l <> '{ENTITY_LABEL}'] AS labels,
+                               score
+                        LIMIT $limit
+                        """,
+                        query=lucene_query,
+                        limit=limit
+                    )
+                    for record in result:
+                        if record["name"] not in matches:
+                            matches[record["name"]] = {
+                                "name": record["name"],
+                                "labels": record["labels"],
+                                "score": record["score"]
+                            }
+            except Exception as e:
+                self.log(f"全文索引查询错误: {str(e)}")
+                
+        return list(matches.values())[:limit]
+
     def save_to_neo4j(self, data):
         try:
             with self.driver.session(database=NEO4J_CONFIG["database"]) as session:
@@ -630,11 +2723,32 @@ class KnowledgeGraphApp:
                     self.extracted_data["entities"].add(entity["name"])
                     self.extracted_data["entity_types"].add(entity["type"])
                     
-                    session.execute_write(
-                        self.create_entity_with_type,
-                        entity["type"],
-                        properties
+                    # 同步更新本地实体索引
+                    self.entity_index.add(
+                        entity["name"],
+                        [re.sub(r'[^a-zA-Z0-9_]', '_', entity["type"])],
+                        entity.get("description")
                     )
+                    
+                    if self.graph_writer:
+                        self.graph_writer.submit_entity(
+                            entity["name"],
+                            self.create_entity_with_type,
+                            entity["type"],
+                            properties
+                        )
+                    else:
+                        session.execute_write(
+                            self.create_entity_with_type,
+                            entity["type"],
+                            properties
+                        )
+                        
+                    # 批量写入等待该实体的关系
+                    if self.pending_edges is not None:
+                        resolved = self.pending_edges.add_known(entity["name"])
+                        if resolved:
+                            self.write_relations_bulk(session, resolved)
                 
                 # 创建关系
                 for relation in data.get("relations", []):
@@ -651,17 +2765,85 @@ class KnowledgeGraphApp:
                     rel_tuple = (relation["source"], relation["relation"], relation["target"])
                     self.extracted_data["relations"].add(rel_tuple)
                     
-                    session.execute_write(
-                        self.create_relation,
-                        relation["source"],
-                        relation["target"],
-                        relation["relation"],
-                        properties
-                    )
+                    # 端点尚未写入时先缓冲，端点出现后再写入
+                    if self.pending_edges is not None:
+                        edge = {
+                            "source": relation["source"],
+                            "target": relation["target"],
+                            "relation": relation["relation"],
+                            "properties": properties
+                        }
+                        if not self.pending_edges.add_edge(edge):
+                            continue
+                    
+                    if self.graph_writer:
+                        self.graph_writer.submit_relation(
+                            relation["source"],
+                            relation["target"],
+                            self.create_relation,
+                            relation["source"],
+                            relation["target"],
+                            relation["relation"],
+                            properties
+                        )
+                    else:
+                        session.execute_write(
+                            self.create_relation,
+                            relation["source"],
+                            relation["target"],
+                            relation["relation"],
+                            properties
+                        )
                     
         except Exception as e:
             self.log(f"Neo4j错误: {str(e)}")
 
+    def write_relations_bulk(self, session, edges):
+        """
+        按关系类型分组批量写入从待写入缓冲区取出的关系。
+        写入确认提交前这些关系仍计入缓冲区，取消或出错时会被保存，下次运行继续写入。
+        """
+        groups = {}
+        for edge in edges:
+            groups.setdefault(edge["relation"], []).append(edge)
+            
+        buffer = self.pending_edges
+        for relation_type, group in groups.items():
+            rows = [{
+                "source": edge["source"],
+                "target": edge["target"],
+                "properties": edge.get("properties", {})
+            } for edge in group]
+            on_commit = None
+            if buffer is not None:
+                buffer.start_writing(group)
+                on_commit = lambda group=group: buffer.written(group)
+                
+            if self.graph_writer:
+                names = [row["source"] for row in rows] + [row["target"] for row in rows]
+                self.graph_writer.submit_dependent(
+                    rows[0]["source"], names, self.create_relations_bulk, relation_type, rows,
+                    on_commit=on_commit)
+            else:
+                session.execute_write(self.create_relations_bulk, relation_type, rows)
+                if on_commit:
+                    on_commit()
+
+    @staticmethod
+    def create_relations_bulk(tx, relation_type, rows):
+        # 转义关系类型中的任何非法字符
+        safe_type = re.sub(r'[^a-zA-Z0-9_]', '_', relation_type)
+        
+        # 使用公共实体标签以便利用名称索引
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (a:{ENTITY_LABEL} {{name: row.source}}), (b:{ENTITY_LABEL} {{name: row.target}})
+        MERGE (a)-[r:{safe_type}]->(b)
+        SET r += row.properties
+        """
+        
+        tx.run(query, rows=rows)
+
     @staticmethod
     def create_entity_with_type(tx, entity_type, properties):
         # 转义标签中的任何非法字符
@@ -682,10 +2864,10 @@ class KnowledgeGraphApp:
         props_string = ", ".join(props_parts)
         params["name_param"] = name_param
         
-        # 执行Cypher查询 - 使用动态标签
+        # 执行Cypher查询 - 使用动态标签，并添加公共实体标签以便索引
         query = f"""
         MERGE (e:{safe_type} {{name: $name_param}})
-        SET e += {{{props_string}}}
+        SET e:{ENTITY_LABEL}, e += {{{props_string}}}
         """
         
         tx.run(query, **params)
@@ -714,9 +2896,9 @@ class KnowledgeGraphApp:
         if props_parts:
             props_clause = f" SET r += {{{', '.join(props_parts)}}}"
             
-        # 执行Cypher查询 - 根据名称匹配实体，使用动态关系类型
+        # 执行Cypher查询 - 按公共实体标签的名称索引匹配实体，使用动态关系类型
         query = f"""
-        MATCH (a {{name: $source}}), (b {{name: $target}})
+        MATCH (a:{ENTITY_LABEL} {{name: $source}}), (b:{ENTITY_LABEL} {{name: $target}})
         MERGE (a)-[r:{safe_type}]->(b)
         {props_clause}
         """
@@ -753,6 +2935,163 @@ class KnowledgeGraphApp:
             
         threading.Thread(target=self.nlp_query, args=(query_text,)).start()
 
+    def execute_batch_query(self):
+        filepath = filedialog.askopenfilename(
+            filetypes=[("Question files", "*.txt *.jsonl"), ("All files", "*.*")])
+        if not filepath:
+            return
+            
+        try:
+            concurrency = max(1, int(self.batch_concurrency_var.get()))
+            rate = float(self.batch_rate_var.get())
+            if rate <= 0:
+                raise ValueError(rate)
+        except ValueError:
+            messagebox.showerror("批量查询", "并发数必须是整数，每秒请求数必须是正数")
+            return
+            
+        self.btn_batch_query.config(state=tk.DISABLED)
+        threading.Thread(
+            target=self.run_batch_queries, args=(filepath, concurrency, rate)).start()
+
+    @staticmethod
+    def load_questions(filepath):
+        """
+        读取问题文件：.jsonl 文件读取每行的 question 字段，其他文件每个非空行为一个问题。
+        """
+        questions = []
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if filepath.endswith(".jsonl"):
+                    question = json.loads(line).get("question")
+                    if question:
+                        questions.append(question)
+                else:
+                    questions.append(line)
+        return questions
+
+    def run_batch_queries(self, filepath, concurrency=8, rate=5):
+        """
+        并发生成并执行一批问题的Cypher查询，结果写入JSONL报告。
+        Cypher生成按 rate 限流；查询在每个工作线程各自持有的只读会话上执行。
+        """
+        self.update_status("正在批量查询...")
+        
+        sessions = []
+        sessions_lock = threading.Lock()
+        local = threading.local()
+        
+        def get_session():
+            # 每个工作线程复用一个只读会话，会话本身不是线程安全的
+            if not hasattr(local, "session"):
+                local.session = self.driver.session(
+                    database=NEO4J_CONFIG["database"], default_access_mode=READ_ACCESS)
+                with sessions_lock:
+                    sessions.append(local.session)
+            return local.session
+            
+        limiter = RateLimiter(rate)
+        
+        def run_one(index, question):
+            record = {"index": index, "question": question, "cypher": None,
+                      "row_count": 0, "success": False}
+            start = time.perf_counter()
+            try:
+                limiter.acquire()
+                generate_start = time.perf_counter()
+                cypher = self.generate_cypher(question)
+                record["generate_latency"] = time.perf_counter() - generate_start
+                record["cypher"] = cypher
+                if not cypher:
+                    record["error"] = "未能生成Cypher查询"
+                else:
+                    execute_start = time.perf_counter()
+                    rows = get_session().execute_read(
+                        lambda tx: [self.format_record(dict(r)) for r in tx.run(cypher)])
+                    record["execute_latency"] = time.perf_counter() - execute_start
+                    record["row_count"] = len(rows)
+                    record["result"] = rows
+                    record["success"] = True
+            except Exception as e:
+                record["error"] = str(e)
+            record["latency"] = time.perf_counter() - start
+            return record
+            
+        try:
+            questions = self.load_questions(filepath)
+            total = len(questions)
+            report_path = os.path.splitext(filepath)[0] + "_report.jsonl"
+            self.log(f"批量查询: {total} 个问题，并发 {concurrency}，限速 {rate}/秒")
+            self.progress_bar["maximum"] = max(1, total)
+            self.progress_bar["value"] = 0
+            
+            # 所有问题共用同一份实体索引，提前加载避免并发重复加载
+            if not self.entity_index_loaded:
+                self.load_entity_index()
+                
+            records = []
+            batch_start = time.perf_counter()
+            with open(report_path, 'w', encoding='utf-8') as report, \
+                    ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = [executor.submit(run_one, i, q) for i, q in enumerate(questions)]
+                for done, future in enumerate(as_completed(futures), 1):
+                    record = future.result()
+                    records.append(record)
+                    report.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                    self.progress_bar["value"] = done
+                    self.update_status(f"批量查询 {done}/{total}")
+            elapsed = time.perf_counter() - batch_start
+            
+            summary = self.summarize_batch(records, elapsed)
+            summary += f"\n报告已保存到: {report_path}"
+            self.display_result(summary)
+            self.log(summary)
+            self.update_status("批量查询完成")
+            
+        except Exception as e:
+            self.log(f"批量查询错误: {str(e)}")
+            self.update_status("批量查询出错")
+            
+        finally:
+            for session in sessions:
+                session.close()
+            self.progress_bar["value"] = 0
+            self.btn_batch_query.config(state=tk.NORMAL)
+
+    @staticmethod
+    def summarize_batch(records, elapsed):
+        """
+        汇总批量查询的成功率和延迟统计。
+        """
+        def percentile(values, p):
+            if not values:
+                return 0.0
+            values = sorted(values)
+            return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+            
+        def describe(name, values):
+            if not values:
+                return f"{name}: 无数据"
+            return (f"{name}: 平均 {sum(values) / len(values):.2f}s, "
+                    f"P50 {percentile(values, 50):.2f}s, P95 {percentile(values, 95):.2f}s, "
+                    f"最大 {max(values):.2f}s")
+                    
+        total = len(records)
+        succeeded = sum(1 for r in records if r["success"])
+        non_empty = sum(1 for r in records if r["row_count"] > 0)
+        lines = [
+            f"问题总数: {total}，总耗时 {elapsed:.2f}s，吞吐 {total / elapsed if elapsed else 0:.2f} 个/秒",
+            f"成功执行: {succeeded} ({succeeded / total:.1%})" if total else "成功执行: 0",
+            f"返回非空结果: {non_empty} ({non_empty / total:.1%})" if total else "返回非空结果: 0",
+            describe("总延迟", [r["latency"] for r in records]),
+            describe("Cypher生成延迟", [r["generate_latency"] for r in records if "generate_latency" in r]),
+            describe("查询执行延迟", [r["execute_latency"] for r in records if "execute_latency" in r]),
+        ]
+        return "\n".join(lines)
+
     def nlp_query(self, question):
         self.update_status("正在处理查询...")
         
@@ -764,9 +3103,10 @@ class KnowledgeGraphApp:
                 self.cypher_area.delete(1.0, tk.END)
                 self.cypher_area.insert(tk.END, cypher)
                 
-                # 执行查询
+                # 执行查询；查询自身已排序时保留其顺序
                 result = self.run_cypher_query(cypher)
-                self.display_result(result)
+                ordered = re.search(r'\bORDER\s+BY\b', cypher, re.IGNORECASE) is not None
+                self.display_result(result, ordered=ordered)
                 
             self.update_status("查询完成")
             
@@ -775,13 +3115,23 @@ class KnowledgeGraphApp:
             self.display_result(f"错误: {str(e)}")
 
     def generate_cypher(self, question):
+        # 将问题中提到的实体链接到图谱中的规范名称，便于生成精确匹配查询
+        linked_entities = self.link_entities(question)
+        linked_info = "(未匹配到实体)"
+        if linked_entities:
+            linked_info = "\n".join([
+                f"- {match['name']} (标签: {', '.join(match['labels']) or ENTITY_LABEL})"
+                for match in linked_entities
+            ])
+            
         # 查询生成的增强系统提示
         system_prompt = f"""
 你是一个专业的航空知识图谱查询助手。你需要将自然语言问题转换为Neo4j的Cypher查询语句。
 
 知识图谱结构:
-1. 实体标签: 使用实体类型作为标签 (例如: Aircraft, Component, System)
-2. 实体属性: name (实体名称), description (可选, 实体描述), confidence (可选, 提取置信度)
+1. 实体标签: 使用实体类型作为标签 (例如: Aircraft, Component, System)，所有实体另有公共标签 {ENTITY_LABEL}，并在 {ENTITY_LABEL}.name 上建有索引
+2. 实体属性: name (实体名称), description (可选, 实体描述), confidence (可选, 提取置信度),
+   degree (关系数), pagerank (节点重要性，预先计算，已建索引)
 3. 关系类型: 动态的关系类型 (例如: is_part_of, controls, requires)
 4. 关系属性: description (可选, 关系描述), confidence (可选, 提取置信度)
 
@@ -791,6 +3141,9 @@ class KnowledgeGraphApp:
 已提取的部分实体示例:
 {', '.join(list(self.extracted_data['entities'])[:20])}
 
+与问题匹配的图谱实体（精确名称和标签）:
+{linked_info}
+
 生成的Cypher查询应该:
 1. 正确理解用户的意图
 2. 使用上述图谱结构
@@ -798,6 +3151,9 @@ class KnowledgeGraphApp:
 4. 返回易于理解的结果
 5. 处理可能的模糊查询情况
 6. 支持路径查询、属性过滤和关系查询
+7. 问题涉及上面匹配到的实体时，使用其精确名称和标签进行等值匹配，例如 MATCH (n:Component {{name: '名称'}})，不要使用 CONTAINS 模糊匹配
+8. 标签不确定时使用 MATCH (n:{ENTITY_LABEL} {{name: '名称'}}) 以利用名称索引
+9. 可能返回大量节点时，按 pagerank 降序排序并使用 LIMIT 限制结果数量，例如 ORDER BY m.pagerank DESC LIMIT 50
 """
 
         tools = [{
@@ -824,7 +3180,7 @@ class KnowledgeGraphApp:
 
         try:
             response = client.chat.completions.create(
-                model="deepseek-chat",
+                model=DEFAULT_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"请将以下问题转换为Cypher查询:\n\n{question}"}
@@ -852,37 +3208,58 @@ class KnowledgeGraphApp:
         except Exception as e:
             return f"查询错误: {str(e)}"
 
-    def display_result(self, result):
+    def display_result(self, result, ordered=False):
         self.query_result_area.delete(1.0, tk.END)
         
         if isinstance(result, list):
             if not result:
                 self.query_result_area.insert(tk.END, "没有找到结果")
             else:
+                # 查询未指定顺序时按节点重要性排序，并只显示前若干条
+                if not ordered:
+                    result = sorted(result, key=self.record_importance, reverse=True)
+                if len(result) > RESULT_DISPLAY_LIMIT:
+                    self.query_result_area.insert(
+                        tk.END, f"共 {len(result)} 条结果，仅显示最重要的前 {RESULT_DISPLAY_LIMIT} 条\n\n")
+                    result = result[:RESULT_DISPLAY_LIMIT]
+                    
                 for item in result:
-                    # 格式化节点和关系
-                    formatted_item = {}
-                    for k, v in item.items():
-                        if hasattr(v, 'labels') and hasattr(v, 'get'):  # Node object
-                            formatted_item[k] = {
-                                "labels": list(v.labels),
-                                "properties": dict(v)
-                            }
-                        elif hasattr(v, 'type') and hasattr(v, 'start_node'):  # Relationship object
-                            formatted_item[k] = {
-                                "type": v.type,
-                                "properties": dict(v)
-                            }
-                        else:
-                            formatted_item[k] = v
-                            
+                    formatted_item = self.format_record(item)
                     self.query_result_area.insert(
                         tk.END, 
-                        json.dumps(formatted_item, indent=2, ensure_ascii=False) + "\n\n"
+                        json.dumps(formatted_item, indent=2, ensure_ascii=False, default=str) + "\n\n"
                     )
         else:
             self.query_result_area.insert(tk.END, str(result))
 
+    @staticmethod
+    def record_importance(item):
+        # 记录中节点的最大PageRank，没有排名信息的记录排在最后
+        scores = [
+            v.get("pagerank") for v in item.values()
+            if hasattr(v, 'labels') and hasattr(v, 'get') and v.get("pagerank") is not None
+        ]
+        return max(scores) if scores else -1.0
+
+    @staticmethod
+    def format_record(item):
+        # 格式化节点和关系
+        formatted_item = {}
+        for k, v in item.items():
+            if hasattr(v, 'labels') and hasattr(v, 'get'):  # Node object
+                formatted_item[k] = {
+                    "labels": list(v.labels),
+                    "properties": dict(v)
+                }
+            elif hasattr(v, 'type') and hasattr(v, 'start_node'):  # Relationship object
+                formatted_item[k] = {
+                    "type": v.type,
+                    "properties": dict(v)
+                }
+            else:
+                formatted_item[k] = v
+        return formatted_item
+
     def update_status(self, message):
         self.status_label.config(text=message)
         self.root.update_idletasks()